@@ -0,0 +1,108 @@
+"""Startup cost of the BetterColorCycler plugin, measured the way Krita loads it.
+
+Each sample runs in a fresh interpreter (so module imports are cold) against the stub
+`krita` module in this directory, and times the phases Krita goes through:
+
+    import      importing the package (__init__.py builds and registers the extension)
+    setup       Extension.setup()
+    window      the windowCreated notifier (loadActions, view notifier)
+    docker      constructing the docker, as the dock widget factory does
+    first_show  showing the docker for the first time (deferred UI construction)
+
+PyQt5 and the Qt application itself are loaded before timing starts: Krita has them
+loaded already. Requires PyQt5.
+
+    python benchmarks/bench_startup.py [--samples N] [--output FILE] [--compare FILE]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from bench_stepping import HERE, ROOT, gitRevision
+
+CHILD = r"""
+import json, os, sys, time
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path[:0] = [%(here)r, %(root)r]
+from PyQt5.QtWidgets import QApplication
+app = QApplication([])
+import krita
+
+clock = time.perf_counter
+phases = {}
+t = clock()
+import betterColorCycler
+phases["import"] = clock() - t
+
+t = clock()
+betterColorCycler.extension.setup()
+phases["setup"] = clock() - t
+
+t = clock()
+krita.Application.notifier().windowCreated.emit()
+phases["window"] = clock() - t
+
+t = clock()
+docker = betterColorCycler.BetterColorCyclerDocker()
+phases["docker"] = clock() - t
+
+t = clock()
+docker.show()
+phases["first_show"] = clock() - t
+
+print(json.dumps(phases))
+"""
+
+
+def sample():
+    out = subprocess.check_output([sys.executable, "-c", CHILD % {"here": HERE, "root": ROOT}], cwd=ROOT)
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=15)
+    parser.add_argument("--output", help="JSON result file")
+    parser.add_argument("--compare", help="previous JSON result file to compare against")
+    args = parser.parse_args(argv)
+
+    try:
+        import PyQt5  # noqa: F401
+    except ImportError:
+        print("PyQt5 not available: the startup benchmark needs it to load the plugin")
+        return 0
+
+    samples = [sample() for _ in range(args.samples)]
+    results = {"revision": gitRevision(), "python": sys.version.split()[0], "samples": args.samples, "phases_ms": {}}
+    for phase in samples[0]:
+        values = [s[phase] * 1000.0 for s in samples]
+        results["phases_ms"][phase] = {"median": statistics.median(values), "min": min(values)}
+    total = [sum(s[p] for p in ("import", "setup", "window")) * 1000.0 for s in samples]
+    results["krita_launch_ms"] = {"median": statistics.median(total), "min": min(total)}
+
+    for phase, stats in results["phases_ms"].items():
+        print(f"{phase:11} median {stats['median']:8.2f} ms   min {stats['min']:8.2f} ms")
+    print(f"{'launch':11} median {results['krita_launch_ms']['median']:8.2f} ms   (import + setup + window)")
+
+    output = args.output or os.path.join(HERE, "results", f"{results['revision']}-startup.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print(f"\nvs {previous.get('revision', args.compare)}:")
+        for phase, stats in results["phases_ms"].items():
+            old = previous.get("phases_ms", {}).get(phase)
+            if old:
+                print(f"  {phase:11} {old['median']:8.2f} -> {stats['median']:8.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
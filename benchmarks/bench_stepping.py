@@ -0,0 +1,333 @@
+"""Throughput, latency, allocation and drift benchmarks for BetterColorCycler stepping.
+
+Runs on plain CPython. The headless ColorStepEngine is always measured; when PyQt5 is
+installed the full extension is also driven through the stub `krita` module in this
+directory, including the QColor/ManagedColor round trips of every tick.
+
+    python benchmarks/bench_stepping.py [--steps N] [--rotations N] [--output FILE] [--compare FILE]
+
+Results are written as JSON (default: benchmarks/results/<git commit>.json) so runs from
+different commits can be compared with --compare.
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+PLUGIN_DIR = os.path.join(ROOT, "betterColorCycler")
+
+
+def loadPluginModule(name):
+    # Register the plugin directory as a bare package so its modules can be imported without
+    # running the Krita-facing package __init__.
+    if "betterColorCycler" not in sys.modules:
+        package = types.ModuleType("betterColorCycler")
+        package.__path__ = [PLUGIN_DIR]
+        sys.modules["betterColorCycler"] = package
+    return importlib.import_module(f"betterColorCycler.{name}")
+
+
+def loadEngineModule():
+    return loadPluginModule("colorStepEngine")
+
+
+def loadExtension():
+    """Return a BetterColorCycler instance running against the stub krita module, or None without PyQt5."""
+    try:
+        import PyQt5  # noqa: F401
+    except ImportError:
+        return None
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, HERE)
+    sys.path.insert(0, ROOT)
+    from PyQt5.QtWidgets import QApplication
+    global _qt_app
+    _qt_app = QApplication.instance() or QApplication([])
+    from betterColorCycler.betterColorCycler import BetterColorCycler
+    import krita
+    ext = BetterColorCycler(krita.Application)
+    ext.setup()
+    return ext
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def measure(step, steps):
+    """Time `steps` calls of step(i); returns ops/sec, p50/p99 latency and traced allocations.
+
+    Python has no cheap per-allocation counter, so allocations are reported through
+    tracemalloc as the peak traced memory of a run and the blocks still alive per step.
+    """
+    for i in range(min(1000, steps)):      # warm up
+        step(i)
+
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for i in range(steps):
+            step(i)
+        total = time.perf_counter() - start
+
+        samples = []
+        clock = time.perf_counter_ns
+        for i in range(min(steps, 20000)):
+            t0 = clock()
+            step(i)
+            samples.append(clock() - t0)
+    finally:
+        gc.enable()
+    samples.sort()
+
+    alloc_steps = min(steps, 5000)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    for i in range(alloc_steps):
+        step(i)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    retained_blocks = sum(s.count_diff for s in stats)
+
+    return {
+        "ops_per_sec": steps / total if total else 0.0,
+        "p50_us": percentile(samples, 50) / 1000.0,
+        "p99_us": percentile(samples, 99) / 1000.0,
+        "peak_traced_bytes": peak,
+        "retained_blocks_per_step": retained_blocks / alloc_steps,
+    }
+
+
+def engineSteps(engine_module):
+    """Per-mode step callables against a fresh engine, feeding each result back in like Krita would."""
+    def make(mode):
+        engine = engine_module.ColorStepEngine()
+        state = {"col": (1.0, 0.2, 0.2)}
+        if mode == "fine":
+            engine.toggleFine(state["col"])
+
+        if mode == "relative":
+            def step(i):
+                state["col"] = engine.stepHue(state["col"], False, 1)
+        elif mode in ("absolute", "fine"):
+            def step(i):
+                state["col"] = engine.stepHue(state["col"], True, 1)
+        elif mode == "jump":
+            def step(i):
+                state["col"] = engine.stepHue(state["col"], True, 37)
+        elif mode == "sv":
+            def step(i):
+                # bounce the value channel so it never sits clamped at an end
+                state["col"] = engine.shiftSV(state["col"], 1, 1 if (i // 20) % 2 else -1)
+        elif mode == "toggle_fine":
+            def step(i):
+                engine.toggleFine(state["col"])
+        return step
+    return make
+
+
+def extensionSteps(ext):
+    def make(mode):
+        ext.engine.resyncFromColor(ext.getCurFGColor())
+        if ext.engine.tog_fine != (mode == "fine"):
+            ext.engine.toggleFine(ext.getCurFGColor())
+
+        if mode == "relative":
+            return lambda i: ext.makeStep(False, 1)
+        if mode in ("absolute", "fine"):
+            return lambda i: ext.makeStep(True, 1)
+        if mode == "jump":
+            return lambda i: ext.step_hue(37, absolute=True)
+        if mode == "sv":
+            return lambda i: ext.shiftSV(1, 1 if (i // 20) % 2 else -1)
+        if mode == "toggle_fine":
+            return lambda i: ext.engine.toggleFine(ext.getCurFGColor())
+    return make
+
+
+def quantize(engine_module, col):
+    # What an 8-bit document hands back after a write.
+    return tuple(c / 255.0 for c in engine_module.keyChannels(engine_module.colorKey(col)))
+
+
+def driftCheck(engine_module, rotations, tick_rotations):
+    """Verify hue and value come back unchanged after full rotations.
+
+    `rotations` full turns are applied as coalesced runs (how the coalescer delivers a fast
+    spin) of a stride coprime to the ring, so the runs land on every step position rather than
+    back on the start each time; `tick_rotations` turns are applied tick by tick. Both read the
+    color back at 8 bits between runs.
+    """
+    results = {}
+    for mode, mode_abs in (("absolute", True), ("relative", False)):
+        engine = engine_module.ColorStepEngine()
+        start = quantize(engine_module, (0.8, 0.3, 0.1))
+        col = start
+        engine.resyncFromColor(col)
+        turn = engine.max_steps if mode_abs else int(engine.rel_max_steps * engine.getSensitivity())
+
+        stride = next(n for n in range(turn // 2 + 1, 2 * turn) if math.gcd(n, turn) == 1)
+        runs, rest = divmod(rotations * turn, stride)
+        for _ in range(runs):
+            col = quantize(engine_module, engine.stepHue(col, mode_abs, stride))
+        if rest:
+            col = quantize(engine_module, engine.stepHue(col, mode_abs, rest))
+        bulk_key = engine_module.keyChannels(engine_module.colorKey(col))
+
+        for _ in range(tick_rotations * turn):
+            col = quantize(engine_module, engine.stepHue(col, mode_abs, 1))
+        tick_key = engine_module.keyChannels(engine_module.colorKey(col))
+
+        start_key = engine_module.keyChannels(engine_module.colorKey(start))
+        drift = max(max(abs(a - b) for a, b in zip(start_key, bulk_key)),
+                    max(abs(a - b) for a, b in zip(start_key, tick_key)))
+        results[mode] = {
+            "rotations": rotations,
+            "tick_rotations": tick_rotations,
+            "stride": stride,
+            "start": start_key,
+            "after_rotations": bulk_key,
+            "after_tick_rotations": tick_key,
+            "max_channel_drift": drift,
+            "ok": drift == 0,
+        }
+    return results
+
+
+def paletteCheck(size, queries=2000):
+    """Nearest-swatch lookups against a random palette of `size` colors: index build time,
+    uncached lookup latency, and agreement with a linear scan on a sample of queries."""
+    palette_module = loadPluginModule("paletteIndex")
+    rng = random.Random(size)
+    palette = [(rng.random(), rng.random(), rng.random()) for _ in range(size)]
+    t0 = time.perf_counter()
+    index = palette_module.PaletteIndex(palette)
+    build_ms = (time.perf_counter() - t0) * 1000.0
+
+    samples = []
+    found = []
+    for _ in range(queries):
+        col = (rng.random(), rng.random(), rng.random())
+        t0 = time.perf_counter_ns()
+        found.append((col, index.nearest(col)))
+        samples.append(time.perf_counter_ns() - t0)
+    samples.sort()
+
+    def linear(col):
+        p = palette_module.srgbToOklab(col)
+        return min(range(size), key=lambda i: sum((a - b) ** 2 for a, b in zip(index.points[i], p)))
+    checked = found[:200]
+    return {
+        "size": size,
+        "build_ms": build_ms,
+        "p50_us": percentile(samples, 50) / 1000.0,
+        "p99_us": percentile(samples, 99) / 1000.0,
+        "exact": all(linear(col) == i for col, i in checked),
+    }
+
+
+def gitRevision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\nvs {previous.get('revision', previous_path)}:")
+    for layer, modes in current["throughput"].items():
+        for mode, stats in modes.items():
+            old = previous.get("throughput", {}).get(layer, {}).get(mode)
+            if not old:
+                continue
+            ratio = stats["ops_per_sec"] / old["ops_per_sec"] if old["ops_per_sec"] else float("inf")
+            print(f"  {layer:9} {mode:11} {ratio:6.2f}x ops/sec  p99 {old['p99_us']:.1f} -> {stats['p99_us']:.1f} us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=200000, help="ticks per throughput run")
+    parser.add_argument("--rotations", type=int, default=10**6, help="full rotations for the drift check")
+    parser.add_argument("--tick-rotations", type=int, default=1000, help="full rotations stepped tick by tick")
+    parser.add_argument("--palette-size", type=int, default=5000, help="swatches for the palette snapping check")
+    parser.add_argument("--output", help="JSON result file")
+    parser.add_argument("--compare", help="previous JSON result file to compare against")
+    args = parser.parse_args(argv)
+
+    engine_module = loadEngineModule()
+    modes = ("relative", "absolute", "fine", "jump", "sv", "toggle_fine")
+    layers = {"engine": engineSteps(engine_module)}
+    ext = loadExtension()
+    if ext is not None:
+        layers["extension"] = extensionSteps(ext)
+    else:
+        print("PyQt5 not available: skipping extension-level benchmarks")
+
+    results = {
+        "revision": gitRevision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "steps": args.steps,
+        "throughput": {},
+    }
+    for layer, make in layers.items():
+        results["throughput"][layer] = {}
+        for mode in modes:
+            stats = measure(make(mode), args.steps)
+            results["throughput"][layer][mode] = stats
+            print(f"{layer:9} {mode:11} {stats['ops_per_sec']:>12,.0f} ops/s  p50 {stats['p50_us']:7.2f} us"
+                  f"  p99 {stats['p99_us']:7.2f} us  peak {stats['peak_traced_bytes']:6d} B"
+                  f"  retained {stats['retained_blocks_per_step']:.3f} blocks/step")
+
+    if ext is not None:
+        import krita
+        results["color_cache"] = ext.color_cache.stats()
+        results["color_cache"]["managed_color_conversions"] = krita.ManagedColor.conversions
+        print(f"color cache {results['color_cache']['hits']} hits / {results['color_cache']['misses']} misses,"
+              f" {krita.ManagedColor.conversions} ManagedColor conversions")
+
+    results["drift"] = driftCheck(engine_module, args.rotations, args.tick_rotations)
+    for mode, drift in results["drift"].items():
+        print(f"drift     {mode:11} {'ok' if drift['ok'] else 'DRIFT'}  max channel drift {drift['max_channel_drift']}"
+              f" after {drift['rotations']} + {drift['tick_rotations']} rotations")
+
+    results["palette"] = paletteCheck(args.palette_size)
+    palette = results["palette"]
+    print(f"palette   {palette['size']} swatches: index built in {palette['build_ms']:.1f} ms, nearest p50"
+          f" {palette['p50_us']:.1f} us  p99 {palette['p99_us']:.1f} us  {'exact' if palette['exact'] else 'MISMATCH'}")
+
+    output = args.output or os.path.join(HERE, "results", f"{results['revision']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    return 0 if all(d["ok"] for d in results["drift"].values()) and palette["exact"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
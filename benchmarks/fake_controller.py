@@ -0,0 +1,91 @@
+"""Fake external dial for BetterColorCycler's controller endpoint (config controller_port).
+
+Send commands to a running Krita:
+
+    python benchmarks/fake_controller.py --port 47800 --command "hue +1" --rate 500 --count 2000
+    python benchmarks/fake_controller.py --port 47800 --command "hue +3;sat -1" --batch 8
+
+or check the endpoint itself without Krita (starts a ControllerServer on a free port,
+sends the commands and verifies every one of them is drained exactly once):
+
+    python benchmarks/fake_controller.py --selftest
+"""
+import argparse
+import socket
+import sys
+import threading
+import time
+
+from bench_stepping import loadPluginModule
+
+
+def send(port, command, count, rate, batch):
+    """Send `count` commands as datagrams of `batch` commands each, at about `rate` commands/sec."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    payload = "\n".join([command] * batch).encode("ascii")
+    interval = batch / rate if rate > 0 else 0.0
+    sent = 0
+    start = time.perf_counter()
+    while sent < count:
+        sock.sendto(payload, ("127.0.0.1", port))
+        sent += batch
+        if interval:
+            delay = start + sent / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    sock.close()
+    return sent, time.perf_counter() - start
+
+
+def selftest(count, rate, batch):
+    controller_module = loadPluginModule("controllerServer")
+    woken = threading.Event()
+    server = controller_module.ControllerServer(0, woken.set)
+    port = server.start()
+
+    drained = []
+    sender = threading.Thread(target=send, args=(port, "hue +2;sat -1;abs-set 42;bogus 1", count, rate, batch))
+    sender.start()
+    sent = -(-count // batch) * batch
+    deadline = time.monotonic() + 10.0 + (count / rate if rate > 0 else 0.0)
+    while (sender.is_alive() or server.queue) and time.monotonic() < deadline:
+        # stands in for the Qt main thread: wait for a wake, then drain everything queued
+        woken.wait(0.1)
+        woken.clear()
+        drained.extend(server.drain())
+    sender.join()
+    time.sleep(0.05)
+    drained.extend(server.drain())
+    server.stop()
+
+    # UDP may drop datagrams under overload; everything that was received must come out once
+    received = server.received * batch
+    hue = sum(n for verb, n in drained if verb == "hue")
+    sat = sum(n for verb, n in drained if verb == "sat")
+    sets = sum(1 for verb, n in drained if verb == "abs-set" and n == 42)
+    ok = hue == 2 * received and sat == -received and sets == received and len(drained) == 3 * received
+    print(f"sent {sent} command lines, received {received} ({sent - received} dropped),"
+          f" drained {len(drained)} commands: hue {hue:+}, sat {sat:+}, abs-set {sets}"
+          f" -> {'ok' if ok else 'MISMATCH'}")
+    return 0 if ok else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=47800)
+    parser.add_argument("--command", default="hue +1", help="command(s) to send, ';'-separated")
+    parser.add_argument("--count", type=int, default=1000, help="number of commands to send")
+    parser.add_argument("--rate", type=float, default=1000.0, help="commands per second, 0 = as fast as possible")
+    parser.add_argument("--batch", type=int, default=1, help="commands per datagram")
+    parser.add_argument("--selftest", action="store_true", help="loop back through a local ControllerServer")
+    args = parser.parse_args(argv)
+
+    if args.selftest:
+        return selftest(args.count, args.rate, args.batch)
+    sent, elapsed = send(args.port, args.command, args.count, args.rate, args.batch)
+    print(f"sent {sent} commands to 127.0.0.1:{args.port} in {elapsed:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
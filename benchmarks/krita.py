@@ -0,0 +1,191 @@
+# Minimal stand-in for Krita's `krita` Python module, just enough to load and drive the
+# BetterColorCycler extension from plain CPython for benchmarking. It mimics the parts of
+# the API the plugin touches: Application/Krita.instance(), windows, views, view notifiers
+# and ManagedColor (with 8-bit quantization, like an 8-bit RGBA document).
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QAction, QDockWidget
+
+
+class ManagedColor:
+
+    conversions = 0     # fromQColor + colorForCanvas calls, so benchmarks can count round trips
+
+    def __init__(self, rgba=0xff000000):
+        self._rgba = rgba
+
+    def components(self):
+        # Krita orders 8-bit RGBA components as BGRA
+        col = QColor.fromRgba(self._rgba)
+        return [col.blueF(), col.greenF(), col.redF(), col.alphaF()]
+
+    def colorModel(self):
+        return "RGBA"
+
+    def colorDepth(self):
+        return "U8"
+
+    def colorProfile(self):
+        return "sRGB-elle-V2-srgbtrc.icc"
+
+    @staticmethod
+    def fromQColor(col):
+        ManagedColor.conversions += 1
+        return ManagedColor(col.rgba())
+
+    def colorForCanvas(self, canvas):
+        ManagedColor.conversions += 1
+        return QColor.fromRgba(self._rgba)
+
+
+class ViewNotifier(QObject):
+    foregroundColorChanged = pyqtSignal()
+    backgroundColorChanged = pyqtSignal()
+
+
+class View:
+
+    def __init__(self):
+        self._fg = ManagedColor(QColor(255, 51, 51).rgba())
+        self._bg = ManagedColor(QColor(255, 255, 255).rgba())
+        self._notifier = ViewNotifier()
+        self.messages = 0
+
+    def notifier(self):
+        return self._notifier
+
+    def foregroundColor(self):
+        return self._fg
+
+    def setForeGroundColor(self, col):
+        self._fg = col
+        self._notifier.foregroundColorChanged.emit()
+
+    def backgroundColor(self):
+        return self._bg
+
+    def setBackGroundColor(self, col):
+        self._bg = col
+        self._notifier.backgroundColorChanged.emit()
+
+    def document(self):
+        return Krita.instance().activeDocument()
+
+    def showFloatingMessage(self, msg, icon, timeout, priority):
+        self.messages += 1
+
+
+class Node:
+
+    def uniqueId(self):
+        from PyQt5.QtCore import QUuid
+        return QUuid("{6b1f8a4e-2f0c-4c1e-9a7e-0d6f3c2b1a00}")
+
+
+class Document:
+
+    def rootNode(self):
+        return Node()
+
+    def fileName(self):
+        return ""
+
+    def colorModel(self):
+        return "RGBA"
+
+    def colorDepth(self):
+        return "U8"
+
+    def colorProfile(self):
+        return "sRGB-elle-V2-srgbtrc.icc"
+
+
+class Window(QObject):
+    activeViewChanged = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self._view = View()
+
+    def activeView(self):
+        return self._view
+
+    def qwindow(self):
+        return None
+
+    def createAction(self, name, text, menu_location="tools/scripts"):
+        action = QAction(text)
+        action.setObjectName(name)
+        return action
+
+
+class AppNotifier(QObject):
+    windowCreated = pyqtSignal()
+    imageClosed = pyqtSignal(str)
+    applicationClosing = pyqtSignal()
+
+
+class Extension(QObject):
+
+    def __init__(self, parent=None):
+        super().__init__()
+
+
+class Krita:
+
+    _instance = None
+
+    def __init__(self):
+        self._window = Window()
+        self._document = Document()
+        self._notifier = AppNotifier()
+        self._extensions = []
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = Krita()
+        return cls._instance
+
+    def activeWindow(self):
+        return self._window
+
+    def activeDocument(self):
+        return self._document
+
+    def documents(self):
+        return [self._document]
+
+    def notifier(self):
+        return self._notifier
+
+    def extensions(self):
+        return self._extensions
+
+    def addExtension(self, extension):
+        self._extensions.append(extension)
+
+    def resources(self, kind):
+        return {}
+
+    def addDockWidgetFactory(self, factory):
+        pass
+
+
+class DockWidget(QDockWidget):
+
+    def canvasChanged(self, canvas):
+        pass
+
+
+class DockWidgetFactoryBase:
+    DockRight = 2
+
+
+class DockWidgetFactory:
+
+    def __init__(self, name, position, cls):
+        self.name, self.position, self.cls = name, position, cls
+
+
+Application = Krita.instance()
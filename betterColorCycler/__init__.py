@@ -1,9 +1,12 @@
 from .betterColorCycler import BetterColorCycler
 from .betterColorCyclerDocker import BetterColorCyclerDocker
+from .cyclerBus import sharedBus
 from krita import Krita, DockWidgetFactory, DockWidgetFactoryBase
 
-# Register your extension.
-Krita.instance().addExtension(BetterColorCycler(Krita.instance()))
+# Register your extension, and hand it to the docker(s) through the bus.
+extension = BetterColorCycler(Krita.instance())
+Krita.instance().addExtension(extension)
+sharedBus().registerExtension(extension)
 
 # Create a dock widget factory.
 # Note: The order here is:
@@ -0,0 +1,44 @@
+import queue
+import threading
+
+# One daemon thread per feature for work that must not block Krita's UI (clustering, layer
+# histograms). Jobs run one at a time in the worker thread; a job still waiting when a newer
+# one is submitted is dropped, since only the latest request matters. `done(key, result)` is
+# called from the worker thread; the extension passes a signal's emit so results arrive on
+# the Qt main thread. A job that raises reports the exception as its result, and the thread
+# goes on with the next job.
+
+
+class BackgroundWorker:
+
+    def __init__(self, done, name="BetterColorCyclerWorker"):
+        self.done = done
+        self.name = name
+        self.jobs = queue.Queue(maxsize=1)
+        self.thread = None
+
+
+    def submit(self, key, func, *args):
+        job = (key, func, args)
+        while True:
+            try:
+                self.jobs.put_nowait(job)
+                break
+            except queue.Full:
+                try:
+                    self.jobs.get_nowait()      # superseded by this request
+                except queue.Empty:
+                    pass
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+            self.thread.start()
+
+
+    def run(self):
+        while True:
+            key, func, args = self.jobs.get()
+            try:
+                result = func(*args)
+            except Exception as error:
+                result = error
+            self.done(key, result)
@@ -1,51 +1,146 @@
-from krita import *
-from math import gcd
-import math
-from PyQt5 import QtWidgets
-from PyQt5.QtCore import QSettings
-from PyQt5.QtCore import QTimer
-
-
-max_steps = 60
-angle_rel = 15
-
-start_pos = 12
-sensitivity = 1
-sensitivity_fine = 4
-sv_step_size = 256 / 30  # ~8.533
-sv_num_steps = 30
-show_mesg = True
-
-class BetterColorCycler(krita.Extension):
+from krita import Application, Extension, ManagedColor
+from PyQt5.QtCore import QRect, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QIcon
+from time import monotonic
+import os
+import zlib
+
+from .colorStepEngine import ColorStepEngine, StepProfile, colorKey, profileKey, HISTORY_FLOAT_FIELDS, HISTORY_INT_WIDTH
+from .colorHistory import ColorHistory
+from .lruCache import LRUCache
+from .cyclerBus import sharedBus
+from .cyclerConfig import sharedConfig, FIELDS, MACRO_SLOTS
+from .deviceProfiles import formatProfiles, parseProfiles, profileValues
+from .viewStates import ViewStateRegistry
+from .notifications import MessageChannel, VERBOSITY_INFO, VERBOSITY_STEPS
+from .stepAcceleration import StepAccelerator
+
+
+color_cache_size = 256  # ManagedColor conversions kept per direction (read / write)
+view_state_capacity = 16   # canvases whose stepping state is kept when switching between them
+palette_check_interval = 1.0    # seconds without writes between checks whether the snap palette was edited
+dominant_resample_idle = 2.0    # a dominant-color / layer-hue tick after this long a pause re-reads the layer
+step_profile_cache_size = 8     # compiled step configurations kept besides the named device profiles
+
+# Hot-path methods timed as phases of the running action while profiling: (phase, method)
+PROFILED_PHASES = (("read", "getCurFGColor"), ("write", "setNewFGColor"), ("echo", "onExternalColorChange"),
+                   ("toast", "toast"))
+
+# Config fields that make up the engine's StepProfile
+STEP_FIELDS = ("hue_steps", "sat_steps", "val_steps", "angle_rel", "sensitivity", "sensitivity_fine",
+               "hue_curve", "sat_curve", "val_curve")
+
+# config.bg_mode values
+BG_OFF, BG_OFFSET, BG_MIRROR = 0, 1, 2
+BG_MODE_NAMES = ("off", "hue offset", "mirrored")
+
+# config.cycle_source values
+SOURCE_HUE, SOURCE_DOMINANT, SOURCE_LAYER_HUES = 0, 1, 2
+SOURCE_NAMES = ("the hue", "the layer's dominant colors", "the hues used in the layer")
+
+# Persisted settings (step counts, coalescing, verbosity, ...) and their defaults live in cyclerConfig.
+
+class BetterColorCycler(Extension):
+
+    # Emitted from the controller's reader thread; queued onto the main thread to drain commands
+    controllerInput = pyqtSignal()
+    # Emitted from the dominant-color / hue-histogram worker threads with (node key, colors / hues)
+    dominantReady = pyqtSignal(str, object)
+    layerHuesReady = pyqtSignal(str, object)
 
     def __init__(self, parent):
         super(BetterColorCycler, self).__init__(parent)
 
-        # ---- Core state (safe defaults so signals won't break things) ----
-        self.prev_col = None
-
-        # Hue tracking
-        self.abs_step = 0
-        self.abs_step_before_fine = 0
-        self.tog_fine = False
-        self.h = 0.0
-        self.h_anchor = 0.0
-
-        # SV tracking
-        self.sv = [0, 0]
-        self.sv_step = [0, 0]
-        self.sv_new_step = [0, 0]
-        self.sv_deltas = [0, 0]
-        self.sv_prev_mode = None
-
-        # Settings-dependent values (set later in setup)
-        self.max_steps = 0
-        self.sat_num_steps = 0
-        self.val_num_steps = 0
-        self.sat_step_size = 0.0
-        self.val_step_size = 0.0
-        self.rel_max_steps = 0
-        self.rel_revs = 0
+        # Shared in-memory configuration; changes from the docker or dialog arrive through `changed`
+        self.config = sharedConfig()
+        self.config.changed.connect(self.onConfigChanged)
+
+        # Compiled step configurations: the named device profiles (compiled when loaded) and
+        # an LRU of other configurations, both keyed by StepProfile.key()
+        self.profiles = {}
+        self.compiled_profiles = {}
+        self.step_profiles = LRUCache(step_profile_cache_size)
+        self.loadProfiles()
+
+        # All hue/SV stepping state lives in the engine; this class only talks to Krita.
+        self.engine = ColorStepEngine()
+        self.engine.useProfile(self.stepProfile())
+
+        # Depth of setNewFGColor calls in progress; foregroundColorChanged fired meanwhile is our own echo
+        self.echo_guard = 0
+
+        # ManagedColor <-> engine color conversions, keyed by value and document color space
+        self.color_cache = LRUCache(color_cache_size)
+        self.doc_context = None
+
+        # Stepping state of the other open canvases, keyed by document id
+        self.view_states = ViewStateRegistry(view_state_capacity)
+        self.view_key = None
+
+        # Tick coalescing: ticks are queued as [kind, arg, count] runs and flushed once per config.coalesce_ms,
+        # to the view they were queued on
+        self.pending_ticks = []
+        self.pending_view = None
+        self.flush_timer = QTimer()
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.timeout.connect(self.onFlushTimer)
+
+        # Undo/redo of written colors: the engine's packed color + step state, plus a flag marking
+        # colors the stepping started from (restored with a resync, they carry no step state)
+        self.history = ColorHistory(self.config.history_capacity, 3 + len(HISTORY_FLOAT_FIELDS),
+                                    HISTORY_INT_WIDTH + 1, self.config.history_merge_ms)
+
+        # Snap-to-palette: nearest-swatch index over config.snap_palette, rebuilt when the
+        # palette's content changes. Krita doesn't signal palette edits, so while snapping is on
+        # the palette is checked on a timer that every write restarts: only when stepping pauses.
+        self.palette_index = None
+        self.palette_signature = None
+        self.palette_timer = QTimer()
+        self.palette_timer.setInterval(int(palette_check_interval * 1000))
+        self.palette_timer.timeout.connect(self.refreshPaletteIndex)
+
+        # Dominant-color cycling: (node key, colors) of the last sampled layer, the position in
+        # it and the worker thread (created on first use)
+        self.dominant = None
+        self.dominant_index = -1
+        self.dominant_tick = -1e9
+        self.dominant_waiting = 0
+        self.dominant_worker = None
+        self.dominantReady.connect(self.onDominantReady)
+
+        # Hues used in the layer: (node key, occupied hue bins) from the histogram worker
+        self.layer_hues = None
+        self.layer_hues_tick = -1e9
+        self.layer_hues_waiting = 0
+        self.hue_worker = None
+        self.layerHuesReady.connect(self.onLayerHuesReady)
+
+        # Macro being recorded: [slot, [verb, count] runs], or None
+        self.recording = None
+
+        # Shortcut ticks move more steps while they repeat fast (config.accel_*)
+        self.accelerator = StepAccelerator()
+        self.configureAcceleration()
+
+        # Canvas messages + log, rate limited and merged
+        self.messages = MessageChannel(self.showMessage, self.config.verbosity, self.config.toast_interval_ms)
+
+        # Live link to the docker(s); __init__.py registers this extension on it.
+        # Actions from loadActions are kept by name so the docker can trigger them over the bus.
+        self.bus = sharedBus()
+        self.actions = {}
+
+        # Per-action latency histograms; None while config.profiling is off
+        self.profiler = None
+
+        # Optional localhost UDP endpoint for external dials (config.controller_port, 0 = off)
+        self.controller = None
+        self.controllerInput.connect(self.drainController)
+
+        # Built on first use: the settings dialog (dialog, {config field: spin box})
+        self.settings_dialog = None
+        # (menu, actions) of each main window's BetterColorCycler menu; a menu is filled when first opened
+        self.window_menus = []
 
         # Hook Krita notifiers
         appNotifier = Application.notifier()
@@ -53,47 +148,222 @@ class BetterColorCycler(krita.Extension):
         # appNotifier.activeViewChanged.connect(lambda *_: self.attach_view_notifier())
         # appNotifier.windowCreated.connect(lambda _: self.attach_view_notifier())
         appNotifier.windowCreated.connect(self.attach_view_notifier)
+        appNotifier.imageClosed.connect(self.onImageClosed)
+        appNotifier.applicationClosing.connect(self.config.flush)
+        appNotifier.applicationClosing.connect(self.stopController)
 
     def updateConfiguration(self, newHueSteps, newSatSteps, newValSteps):
-        from PyQt5.QtCore import QSettings
-        settings = QSettings()
+        # Subscribers (this extension included) pick the new values up from the config's changed signal.
+        self.config.update(hue_steps=newHueSteps, sat_steps=newSatSteps, val_steps=newValSteps)
+
+
+    def onConfigChanged(self, changed):
+        config = self.config
+        if "device_profiles" in changed:
+            self.loadProfiles()
+        if changed & set(STEP_FIELDS):
+            self.flushSteps()
+            self.engine.useProfile(self.stepProfile())
+            if changed & {"hue_steps", "sat_steps", "val_steps"} and "active_profile" not in changed:
+                self.toast(f"Configuration updated: Hue Steps = {config.hue_steps}, Sat Steps = {config.sat_steps}, Value Steps = {config.val_steps}")
+            self.publishState()
+        if "verbosity" in changed:
+            self.messages.verbosity = config.verbosity
+        if "toast_interval_ms" in changed:
+            self.messages.min_interval_ms = config.toast_interval_ms
+        if "controller_port" in changed:
+            self.startController()
+        if any(name.startswith("accel_") for name in changed):
+            self.configureAcceleration()
+        if "snap_palette" in changed:
+            self.refreshPaletteIndex()
+        if "history_capacity" in changed:
+            self.history.resize(config.history_capacity)
+        if "history_merge_ms" in changed:
+            self.history.merge_ms = config.history_merge_ms
+        if "profiling" in changed:
+            self.configureProfiling()
+
+
+    # Device profiles (deviceProfiles): named sets of stepping settings. Each one's StepProfile
+    # is compiled when the profiles are loaded, so switching only swaps the engine's tables and
+    # copies the values into the config fields (which the docker and dialog follow).
+
+    def stepProfile(self, values=None):
+        """Compiled StepProfile for the given profile values (default: the live config)."""
+        config = self.config
+        values = values or {}
+        args = [FIELDS[name][0](values[name]) if name in values else getattr(config, name) for name in STEP_FIELDS]
+        key = profileKey(*args[:6], args[6:])
+        compiled = self.compiled_profiles.get(key)
+        if compiled is not None:
+            return compiled
+        return self.step_profiles.lookup(key, lambda: StepProfile(*args[:6], curves=args[6:]))
+
+
+    def loadProfiles(self):
+        """Parse config.device_profiles and compile every profile's step tables."""
+        self.profiles = parseProfiles(self.config.device_profiles)
+        compiled = {}
+        for values in self.profiles.values():
+            profile = self.stepProfile(values)
+            compiled[profile.key()] = profile
+        self.compiled_profiles = compiled
+
+
+    def switchProfile(self, name):
+        values = self.profiles.get(name)
+        if values is None:
+            self.toast(f"No device profile named {name}")
+            return
+        self.flushSteps()
+        self.engine.useProfile(self.stepProfile(values))
+        self.config.update(active_profile=name, **values)
+        self.toast(f"Device profile: {name}")
 
-        # Update instance variables.
-        self.max_steps = newHueSteps
-        self.sat_num_steps = newSatSteps
-        self.val_num_steps = newValSteps
-        self.sat_step_size = 255.0 / self.sat_num_steps
-        self.val_step_size = 255.0 / self.val_num_steps
 
-        # Write new values to QSettings.
-        settings.setValue("BetterColorCycler/hue_steps", newHueSteps)
-        settings.setValue("BetterColorCycler/sat_steps", newSatSteps)
-        settings.setValue("BetterColorCycler/val_steps", newValSteps)
+    def nextProfile(self):
+        """Switch to the device profile after the active one (by name)."""
+        names = sorted(self.profiles)
+        if not names:
+            self.toast("No device profiles saved yet.")
+            return
+        later = [name for name in names if name > self.config.active_profile]
+        self.switchProfile(later[0] if later else names[0])
 
-        self.toast(f"Configuration updated: Hue Steps = {newHueSteps}, Sat Steps = {newSatSteps}, Value Steps = {newValSteps}")
 
+    def saveProfile(self, name):
+        """Store the live settings as device profile `name` (replacing one of that name)."""
+        profiles = dict(self.profiles)
+        profiles[name] = profileValues(self.config)
+        self.config.update(device_profiles=formatProfiles(profiles), active_profile=name)
 
-    def setup(self):
-        """Load settings + compute step sizes."""
-        from PyQt5.QtCore import QSettings
-        settings = QSettings()
 
-        # Load settings
-        self.max_steps = settings.value("BetterColorCycler/hue_steps", max_steps, type=int)
-        self.sat_num_steps = settings.value("BetterColorCycler/sat_steps", 30, type=int)
-        self.val_num_steps = settings.value("BetterColorCycler/val_steps", 30, type=int)
+    def deleteProfile(self, name):
+        profiles = dict(self.profiles)
+        if profiles.pop(name, None) is None:
+            return
+        values = {"device_profiles": formatProfiles(profiles)}
+        if self.config.active_profile == name:
+            values["active_profile"] = ""
+        self.config.update(**values)
+
 
-        # Step sizes
-        self.sat_step_size = 255.0 / self.sat_num_steps
-        self.val_step_size = 255.0 / self.val_num_steps
+    def configureAcceleration(self):
+        config = self.config
+        self.accelerator.configure(config.accel_enabled, config.accel_threshold_hz,
+                                   config.accel_gain, config.accel_curve, config.accel_max)
 
-        # Relative hue stepping setup
-        self.rel_max_steps = self.lcm(angle_rel, 360) / angle_rel
-        self.rel_revs = self.lcm(angle_rel, 360) / 360
+
+    def setup(self):
+        """Install the profiler (if enabled) and hook the active view."""
+        self.configureProfiling()
+        self.refreshPaletteIndex()
 
         # Attach notifier to active view
         self.attach_view_notifier()
 
+        self.startController()
+
+
+    def startController(self):
+        """(Re)start the external controller endpoint on config.controller_port; stop it when that's 0."""
+        self.stopController()
+        if self.config.controller_port <= 0:
+            return
+        from .controllerServer import ControllerServer
+        controller = ControllerServer(self.config.controller_port, self.controllerInput.emit)
+        try:
+            controller.start()
+        except OSError as e:
+            self.toast(f"Controller port {self.config.controller_port} unavailable: {e}")
+            return
+        self.controller = controller
+
+
+    def stopController(self):
+        if self.controller is not None:
+            self.controller.stop()
+            self.controller = None
+
+
+    def drainController(self):
+        """Feed queued controller commands into the normal stepping path (main thread)."""
+        if self.controller is None:
+            return
+        for verb, count in self.controller.drain():
+            if verb == "hue":
+                self.queueStep("hue", False, count)
+            elif verb == "abs":
+                self.queueStep("hue", True, count)
+            elif verb == "sat":
+                self.queueStep("sv", 0, count)
+            elif verb == "val":
+                self.queueStep("sv", 1, count)
+            elif verb == "abs-set":
+                self.recordCommand("abs-set", count)
+                self.set_abs_step(count)
+            elif verb == "fine":
+                self.toggleFine()
+            elif verb == "reset":
+                self.resetSteps()
+
+
+    def configureProfiling(self):
+        if self.config.profiling:
+            self.installProfiler()
+        else:
+            self.removeProfiler()
+
+
+    def installProfiler(self):
+        """Wrap the hot-path phases in timers. Actions, the flush timer and the view notifier look
+        the methods up on every call, so this takes effect at once."""
+        if self.profiler is not None:
+            return
+        from .instrumentation import ActionProfiler
+        self.profiler = ActionProfiler()
+        for phase, name in PROFILED_PHASES:
+            setattr(self, name, self.profiler.wrapPhase(phase, getattr(self, name)))
+
+
+    def removeProfiler(self):
+        """Drop the timers and the collected histograms."""
+        if self.profiler is None:
+            return
+        for phase, name in PROFILED_PHASES:
+            del self.__dict__[name]          # back to the class's method
+        self.profiler = None
+
+
+    def timed(self, name, callback):
+        """Run `callback`, timed as action `name` while profiling."""
+        if self.profiler is None:
+            return callback()
+        return self.profiler.runAction(name, callback)
+
+
+    def onFlushTimer(self):
+        # Coalesced writes happen on the timer, outside any shortcut; report them as their own action
+        self.timed("flush", self.flushSteps)
+
+
+    def profileReport(self):
+        return self.profiler.report() if self.profiler else "Profiling is disabled."
+
+
+    def dumpProfile(self):
+        """Write the per-action latency histograms to a JSON file in Krita's app data folder."""
+        if self.profiler is None:
+            self.toast("Profiling is disabled.")
+            return None
+        from PyQt5.QtCore import QStandardPaths
+        folder = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+        os.makedirs(folder, exist_ok=True)
+        path = self.profiler.dump(os.path.join(folder, "betterColorCycler_profile.json"))
+        self.toast(f"Profile written to {path}")
+        return path
+
 
     def attach_view_notifier(self, retries=3):
         win = Application.activeWindow()
@@ -111,60 +381,89 @@ class BetterColorCycler(krita.Extension):
             return
 
         try:
-            notifier().foregroundColorChanged.disconnect(self.onExternalColorChange)
+            notifier().foregroundColorChanged.disconnect(self.onForegroundChanged)
         except Exception:
             pass
-        notifier().foregroundColorChanged.connect(self.onExternalColorChange)
+        notifier().foregroundColorChanged.connect(self.onForegroundChanged)
 
 
-    def resetAllSV(self, col):
-        """Reset both saturation and value step counters to match the given color."""
-        # Safety: ensure setup was run
-        if self.sat_step_size == 0 or self.val_step_size == 0:
-            self.setup()
+    def onActiveViewChanged(self):
+        # Ticks still queued were meant for the canvas we just left: write them there, with its
+        # engine state, before that's parked. They're dropped only if that view was closed.
+        if self.pending_ticks and self.pending_view is not None and self.pending_view.document() is not None:
+            self.flushSteps(self.pending_view)
+        self.pending_ticks = []
+        self.flush_timer.stop()
+        self.accelerator.reset()
 
-        self.sv_prev_mode = None
-        self.sv = [col.hsvSaturation(), col.value()]
-        self.sv_new_step = [
-            math.ceil(self.sv[0] / self.sat_step_size),
-            math.ceil(self.sv[1] / self.val_step_size)
-        ]
-        self.sv_step = self.sv_new_step.copy()
+        self.switchViewState()
+        self.invalidateColorCache()
+        self.attach_view_notifier()
 
 
+    def onImageClosed(self, *args):
+        self.invalidateColorCache()
+        live = {self.documentKey(doc) for doc in Application.documents()}
+        self.view_states.prune(live)
+        if self.view_key not in live:
+            self.view_key = None
 
-    def onExternalColorChange(self):
-        """Called whenever Krita's foreground color changes externally (picker, palette, etc.)."""
-        col = self.getCurFGColor()
-        self.resyncFromColor(col)
-        # self.toast(f"Synced to external color {col.name()}")
 
+    def documentKey(self, doc):
+        """Stable id of a document: its root node's uuid (Krita's Python wrappers themselves are transient)."""
+        if doc is None:
+            return None
+        root = doc.rootNode()
+        return root.uniqueId().toString() if root else doc.fileName()
 
-    def resyncFromColor(self, col):
-        """Reset all plugin state from the given QColor."""
 
-        # Safety: ensure setup was run
-        if self.sat_step_size == 0 or self.val_step_size == 0:
-            self.setup()
+    def switchViewState(self):
+        """Park the engine state of the previous canvas and bring back the active canvas' state, if known."""
+        win = Application.activeWindow()
+        view = win.activeView() if win else None
+        key = self.documentKey(view.document()) if view else None
+        if key == self.view_key:
+            return
+
+        if self.view_key is not None:
+            self.view_states.save(self.view_key, self.engine.saveState())
+        self.view_key = key
+
+        state = self.view_states.restore(key) if key is not None else None
+        if state is not None:
+            self.engine.restoreState(state)
+        else:
+            self.engine.forgetColor()
+        self.publishState()
 
-        # Reset hue tracking
-        self.h = col.hsvHueF()
-        self.h_anchor = self.h
-        self.abs_step = 0
-        self.abs_step_before_fine = 0
 
-        # Reset SV tracking
-        self.sv_prev_mode = None
-        self.sv = [col.hsvSaturation(), col.value()]
-        self.sv_new_step = [
-            math.ceil(self.sv[0] / self.sat_step_size),
-            math.ceil(self.sv[1] / self.val_step_size)
-        ]
-        self.sv_step = self.sv_new_step.copy()
+    def invalidateColorCache(self, *args):
+        """Forget cached conversions; the document (or its color space) they were made for is gone."""
+        self.color_cache.clear()
+        self.doc_context = None
 
-        # Remember this color
-        self.prev_col = col
 
+    def documentContext(self):
+        """(model, depth, profile) of the active document, cached until the next invalidation."""
+        if self.doc_context is None:
+            doc = Application.activeDocument()
+            self.doc_context = (doc.colorModel(), doc.colorDepth(), doc.colorProfile()) if doc else ()
+        return self.doc_context
+
+
+    def onForegroundChanged(self):
+        # The connected slot stays the same while the profiler wraps onExternalColorChange
+        self.onExternalColorChange()
+
+
+    def onExternalColorChange(self):
+        """Called whenever Krita's foreground color changes externally (picker, palette, etc.)."""
+        if self.echo_guard:
+            return      # synchronous echo of our own write
+        col = self.getCurFGColor()
+        if self.engine.testColorChanged(col):       # a late echo of our own write keys equal
+            self.engine.resyncFromColor(col)
+            self.publishState()
 
 
     def createActions(self, window):
@@ -172,212 +471,639 @@ class BetterColorCycler(krita.Extension):
 
 
     def loadActions(self):
+        from PyQt5 import sip
+        from PyQt5.QtWidgets import QMenu
         window = Application.activeWindow()
 
-        # Create the top-level plugin menu and store it as an attribute.
-        self.menu_bcc = QtWidgets.QMenu("BetterColorCycler", window.qwindow())
+        # Create this window's top-level plugin menu; it's filled with this window's actions when first opened.
+        menu = QMenu("BetterColorCycler", window.qwindow())
+        menu_actions = []
+        # drop the menus of windows that were closed since
+        self.window_menus = [entry for entry in self.window_menus if not sip.isdeleted(entry[0])]
+        self.window_menus.append((menu, menu_actions))
+        menu.aboutToShow.connect(lambda: self.populateMenu(menu, menu_actions))
 
         # Create the parent action in the "tools/scripts" category and attach the QMenu.
         action_bcc = window.createAction("better_color_cycler_menu", "BetterColorCycler", "tools/scripts")
-        action_bcc.setMenu(self.menu_bcc)
+        action_bcc.setMenu(menu)
+
+        # Cached conversions and the view notifier both belong to the active view
+        window.activeViewChanged.connect(self.onActiveViewChanged)
 
-        # Helper function: create an action in the submenu.
+        # Helper function: create an action in the submenu. It runs through runAction, so it's
+        # timed while profiling; triggered's `checked` isn't passed on.
         def add_plugin_action(name, label, callback):
             a = window.createAction(name, label, "tools/scripts/better_color_cycler_menu")
-            a.triggered.connect(callback)
-            self.menu_bcc.addAction(a)
+            self.actions[name] = callback
+            a.triggered.connect(lambda _checked=False: self.runAction(name))
+            menu_actions.append(a)
 
         # Add all your sub-actions.
-        add_plugin_action("rotate_c_rel", "Rotate Hue Clockwise (Relative)", lambda: self.makeStep(False, 1))
-        add_plugin_action("rotate_cc_rel", "Rotate Hue Counter-Clockwise (Relative)", lambda: self.makeStep(False, -1))
-        add_plugin_action("rotate_c_abs", "Rotate Hue Clockwise (Absolute)", lambda: self.makeStep(True, 1))
-        add_plugin_action("rotate_cc_abs", "Rotate Hue Counter-Clockwise (Absolute)", lambda: self.makeStep(True, -1))
+        add_plugin_action("rotate_c_rel", "Rotate Hue Clockwise (Relative)", lambda: self.tickStep("hue", False, 1))
+        add_plugin_action("rotate_cc_rel", "Rotate Hue Counter-Clockwise (Relative)", lambda: self.tickStep("hue", False, -1))
+        add_plugin_action("rotate_c_abs", "Rotate Hue Clockwise (Absolute)", lambda: self.tickStep("hue", True, 1))
+        add_plugin_action("rotate_cc_abs", "Rotate Hue Counter-Clockwise (Absolute)", lambda: self.tickStep("hue", True, -1))
         add_plugin_action("reset_step_counter", "Reset Step Counter", self.resetSteps)
         add_plugin_action("toggle_fine", "Toggle Fine Steps", self.toggleFine)
-        add_plugin_action("shift_s_pos", "Increase Saturation", lambda: self.shiftSV(0, 1))
-        add_plugin_action("shift_s_neg", "Decrease Saturation", lambda: self.shiftSV(0, -1))
-        add_plugin_action("shift_v_pos", "Increase Value", lambda: self.shiftSV(1, 1))
-        add_plugin_action("shift_v_neg", "Decrease Value", lambda: self.shiftSV(1, -1))
+        add_plugin_action("shift_s_pos", "Increase Saturation", lambda: self.tickStep("sv", 0, 1))
+        add_plugin_action("shift_s_neg", "Decrease Saturation", lambda: self.tickStep("sv", 0, -1))
+        add_plugin_action("shift_v_pos", "Increase Value", lambda: self.tickStep("sv", 1, 1))
+        add_plugin_action("shift_v_neg", "Decrease Value", lambda: self.tickStep("sv", 1, -1))
+        add_plugin_action("bcc_history_undo", "Previous Color", self.undoColor)
+        add_plugin_action("bcc_history_redo", "Next Color", self.redoColor)
+        add_plugin_action("bcc_cycle_source", "Cycle Color Source", self.cycleColorSource)
+        add_plugin_action("bcc_cycle_bg_mode", "Cycle Background Pairing", self.cycleBackgroundMode)
+        add_plugin_action("bcc_macro_record", "Start/Stop Recording Macro", self.toggleRecording)
+        for slot in range(1, MACRO_SLOTS + 1):
+            add_plugin_action(f"bcc_macro_{slot}", f"Play Macro {slot}", lambda slot=slot: self.playMacro(slot))
+        add_plugin_action("bcc_next_profile", "Next Device Profile", self.nextProfile)
         add_plugin_action("bcs_configure", "Configure BetterColorCycler", self.showSettingsDialog)
+        add_plugin_action("bcc_dump_profile", "Dump BetterColorCycler Timings", self.dumpProfile)
+
+
+    def populateMenu(self, menu, actions):
+        if menu.isEmpty():
+            menu.addActions(actions)
+
+    def runAction(self, name):
+        """Run a registered action by name (for its menu entry or shortcut, and the docker through the bus)."""
+        callback = self.actions.get(name)
+        if callback is not None:
+            self.timed(name, callback)
+
+
+    def stateSnapshot(self):
+        engine = self.engine
+        return {
+            "abs_step": engine.abs_step,
+            "abs_step_before_fine": engine.abs_step_before_fine,
+            "tog_fine": engine.tog_fine,
+            "h": engine.h,
+            "h_anchor": engine.h_anchor,
+            "sv_step": list(engine.sv_step),
+            "max_steps": engine.max_steps,
+            "positions": engine.max_steps * engine.getSensitivity(),
+            "sat_num_steps": engine.sat_num_steps,
+            "val_num_steps": engine.val_num_steps,
+            "sat_levels": engine.sat_levels,
+            "val_levels": engine.val_levels,
+            "hue_warp": engine.hue_warp,
+            "color": engine.prev_col,
+            "accel": self.accelerator.last_multiplier,
+            "recording": self.recording[0] if self.recording else 0,
+        }
+
+
+    def publishState(self):
+        self.bus.publishState(self)
 
 
-    def testColorChanged(self,col):         # color must have changed outside this script
-        return self.prev_col == None or self.prev_col.name() != col.name()
+    def resetSteps(self):
+        self.flushSteps()
+        self.recordCommand("reset", 1)
+        self.engine.resetSteps()
+        self.toast("Step counter has been reset.")
+        self.publishState()
+
+
+    # Scripting API (Krita's Scripter, other plugins):
+    #
+    #   from betterColorCycler import extension
+    #   extension.step_hue(12, absolute=True)
+    #   extension.apply(["sat -3", ("val", 2), ("abs-set", 0)])
+    #
+    # Each call applies queued shortcut ticks first, then computes the final color from one
+    # read of the foreground color and writes it once, whatever the step counts.
+
+    def step_hue(self, n, absolute=False):
+        """Move the hue `n` steps (relative, or on the absolute ring); returns the new (r, g, b) color."""
+        return self.apply([("abs" if absolute else "hue", n)])
+
+
+    def step_sat(self, n):
+        return self.apply([("sat", n)])
+
+
+    def step_val(self, n):
+        return self.apply([("val", n)])
+
+
+    def set_abs_step(self, k):
+        """Jump to absolute hue step `k` of the ring anchored at the last picked color."""
+        return self.apply([("abs-set", k)])
+
+
+    def apply(self, commands):
+        """Run a batch of (verb, count) commands, or command strings like "hue +3; sat -1", with one write.
+
+        Verbs are the controller's: hue, abs, sat, val, abs-set, fine, reset.
+        """
+        from .stepCommands import VERBS, parseCommands
+        if isinstance(commands, str):
+            commands = [commands]
+        batch = []
+        for command in commands:
+            if isinstance(command, str):
+                batch.extend(parseCommands(command))
+                continue
+            verb, count = command if len(command) == 2 else (command[0], 1)
+            if verb not in VERBS:
+                raise ValueError(f"Unknown BetterColorCycler command: {verb}")
+            batch.append((verb, int(count)))
+
+        self.flushSteps()
+        engine = self.engine
+        start = col = self.getCurFGColor()
+        ticks = []
+        for verb, count in batch:
+            if verb == "hue" or verb == "abs":
+                col = engine.stepHue(col, verb == "abs", count)
+                ticks.append(("hue", verb == "abs", count))
+            elif verb == "abs-set":
+                col, delta = engine.setAbsStep(col, count)
+                ticks.append(("hue", True, delta))
+            elif verb == "sat" or verb == "val":
+                col = engine.shiftSV(col, 0 if verb == "sat" else 1, count)
+                ticks.append(("sv", 0 if verb == "sat" else 1, count))
+            elif verb == "fine":
+                engine.toggleFine(col)
+            elif verb == "reset":
+                engine.resetSteps()
+        self.setNewFGColor(col, start)
+
+        if any(kind == "hue" and arg for kind, arg, count in ticks):
+            self.toast(self.stepMessage(), VERBOSITY_STEPS)
+        self.bus.publishSteps(ticks)
+        self.publishState()
+        return col
 
 
-    def testSVModeChanged(self,mod):
-        return self.sv_prev_mode == None or self.sv_prev_mode != mod
+    # Macros: the step commands of shortcut ticks, controller input, fine toggles and resets
+    # are recorded into a config.macro_N slot as text ("hue +3; sat -1; fine"). Playing one
+    # runs it through apply(), so the whole sequence is one read and one write. Dominant-color
+    # and layer-hue ticks aren't recorded, they depend on the layer they were made on.
+
+    def recordCommand(self, verb, count):
+        """Append a command to the macro being recorded, merged into the previous one where that's exact."""
+        if self.recording is None:
+            return
+        commands = self.recording[1]
+        if commands:
+            last = commands[-1]
+            # same rule as tick coalescing: hue steps add up, SV steps clamp so only same-direction ones do
+            if last[0] == verb and (verb in ("hue", "abs") or (verb in ("sat", "val") and (last[1] > 0) == (count > 0))):
+                last[1] += count
+                return
+        commands.append([verb, count])
 
 
-    def resetRelMode(self,col):
-        self.prev_col = col
-        self.updateHue(col.hsvHueF(),col.hsvSaturationF())
+    def macro(self, slot):
+        """(name, commands text) stored in macro slot `slot`."""
+        name, _, commands = getattr(self.config, f"macro_{slot}").partition(":")
+        return name.strip() or f"Macro {slot}", commands.strip()
 
 
-    def resetSV(self, col, mod):
-        """Resets the internal step counters for Saturation and Value."""
-        self.sv_prev_mode = mod
-        self.updateHue(col.hsvHueF(), col.hsvSaturationF())
+    def startRecording(self, slot):
+        self.flushSteps()
+        self.recording = [slot, []]
+        self.toast(f"Recording {self.macro(slot)[0]}")
+        self.publishState()
 
-        self.sv = [col.hsvSaturation(), col.value()]
 
-        # Ensure safe defaults
-        if not hasattr(self, 'sat_num_steps') or self.sat_num_steps <= 0:
-            self.sat_num_steps = 30
-        if not hasattr(self, 'val_num_steps') or self.val_num_steps <= 0:
-            self.val_num_steps = 30
+    def stopRecording(self):
+        """Finish recording and store the macro in its slot (an empty recording keeps the old one)."""
+        if self.recording is None:
+            return
+        self.flushSteps()
+        (slot, commands), self.recording = self.recording, None
+        from .stepCommands import formatCommands
+        text = formatCommands((verb, count) for verb, count in commands if count != 0 or verb in ("fine", "reset"))
+        name = self.macro(slot)[0]
+        if text:
+            self.config.update(**{f"macro_{slot}": f"{name}: {text}"})
+            self.toast(f"{name} recorded: {text}")
+        else:
+            self.toast(f"{name}: nothing recorded")
+        self.publishState()
 
-        if not hasattr(self, 'sat_step_size') or self.sat_step_size <= 0:
-            self.sat_step_size = 255.0 / self.sat_num_steps
-        if not hasattr(self, 'val_step_size') or self.val_step_size <= 0:
-            self.val_step_size = 255.0 / self.val_num_steps
 
-        self.sv_new_step = [
-            math.ceil(self.sv[0] / self.sat_step_size),
-            math.ceil(self.sv[1] / self.val_step_size)
-        ]
-        self.sv_step = self.sv_new_step.copy()
+    def toggleRecording(self, slot=None):
+        """Start recording into `slot` (default: the first empty one, else the last), or stop recording."""
+        if self.recording is not None:
+            self.stopRecording()
+            return
+        if slot is None:
+            empty = [n for n in range(1, MACRO_SLOTS + 1) if not self.macro(n)[1]]
+            slot = empty[0] if empty else MACRO_SLOTS
+        self.startRecording(slot)
+
+
+    def playMacro(self, slot):
+        name, commands = self.macro(slot)
+        if self.recording is not None:
+            self.toast("Stop recording before playing a macro.")
+            return None
+        if not commands:
+            self.toast(f"{name} is empty.")
+            return None
+        return self.apply(commands)
+
+
+    def tickStep(self, kind, arg, direction):
+        """One shortcut tick: queue `direction` steps, scaled up while the action repeats fast."""
+        if kind == "hue" and self.config.cycle_source == SOURCE_DOMINANT:
+            self.stepDominant(direction)
+            return
+        if kind == "hue" and self.config.cycle_source == SOURCE_LAYER_HUES:
+            self.stepLayerHue(direction)
+            return
+        self.queueStep(kind, arg, self.accelerator.scale((kind, arg), direction))
 
 
-    def resetSteps(self):
-        self.abs_step = 0
-        if (show_mesg):
-            self.toast("Step counter has been reset.")
+    def queueStep(self, kind, arg, direction):
+        """Collect a hue ("hue", mode_abs) or SV ("sv", mode_sv) tick; the net result is written on the next flush."""
+        if direction == 0:
+            return
+        if self.recording is not None:
+            self.recordCommand(("sat", "val")[arg] if kind == "sv" else "abs" if arg else "hue", direction)
+        if self.config.coalesce_ms <= 0:
+            if kind == "hue":
+                self.makeStep(arg, direction)
+            else:
+                self.shiftSV(arg, direction)
+            return
+
+        # Merge into the previous run when that can't change the outcome: hue steps always add up,
+        # SV steps are clamped per tick, so only same-direction SV ticks may be merged.
+        if self.pending_ticks:
+            last = self.pending_ticks[-1]
+            if last[0] == kind and last[1] == arg and (kind == "hue" or (last[2] > 0) == (direction > 0)):
+                last[2] += direction
+                return
+        if not self.pending_ticks:
+            self.pending_view = Application.activeWindow().activeView()
+        self.pending_ticks.append([kind, arg, direction])
+
+        if not self.flush_timer.isActive():
+            self.flush_timer.start(self.config.coalesce_ms)
+
+
+    def flushSteps(self, view=None):
+        """Apply all queued ticks in order against a single color read, then write the result once
+        (to `view`, by default the active one)."""
+        self.flush_timer.stop()
+        if not self.pending_ticks:
+            return
+        ticks, self.pending_ticks = self.pending_ticks, []
+        self.pending_view = None
+
+        start = col = self.getCurFGColor(view)
+        for kind, arg, count in ticks:
+            if kind == "hue":
+                col = self.engine.stepHue(col, arg, count)
+            else:
+                col = self.engine.shiftSV(col, arg, count)     # SV runs are single-direction, one clamp suffices
+        self.setNewFGColor(col, start, view=view)
+
+        if any(kind == "hue" and arg for kind, arg, count in ticks):
+            self.toast(self.stepMessage(), VERBOSITY_STEPS)
+        self.bus.publishSteps(ticks)
+        self.publishState()
 
 
     def makeStep(self, mode_abs, direction):
-        # Safety: ensure setup was run
-        if self.sat_step_size == 0 or self.val_step_size == 0:
-            self.setup()
         col = self.getCurFGColor()
+        self.setNewFGColor(self.engine.stepHue(col, mode_abs, direction), col)
+        if mode_abs:
+            self.toast(self.stepMessage(), VERBOSITY_STEPS)
+        self.bus.publishSteps((("hue", mode_abs, direction),))
+        self.publishState()
 
-        # Always resync if the color changed outside the plugin (picker, palette, etc.)
-        if self.testColorChanged(col):
-            self.resyncFromColor(col)
-            col = self.prev_col  # after resync, keep using the synced color
 
-        if mode_abs:
-            self.abs_step += direction
-            sensitivity_used = sensitivity_fine if self.tog_fine else sensitivity
+    def shiftSV(self, mode_sv, direction):
+        col = self.getCurFGColor()
+        self.setNewFGColor(self.engine.shiftSV(col, mode_sv, direction), col)
+        self.bus.publishSteps((("sv", mode_sv, direction),))
+        self.publishState()
+
+
+    def setNewFGColor(self, col, origin=None, record=True, view=None):
+        """Write an engine (r, g, b) color to `view` (default: the active view); `origin` is the color
+        the step started from.
+
+        With joint stepping (config.bg_mode) the background color is derived from the same
+        engine state and written alongside, under the same echo guard.
+        """
+        view = view or Application.activeWindow().activeView()
+        bg = None
+        if self.config.bg_mode:
+            bg = self.engine.pairedColor(self.config.bg_mode == BG_MIRROR, self.config.bg_hue_offset / 360)
+        palette = self.palette_index
+        if palette is not None:
+            # the engine keeps stepping on its own grid; only what's written lands on swatches
+            col = palette.snap(col)
+            bg = palette.snap(bg) if bg is not None else None
+            self.palette_timer.start()          # no palette checks while stepping
+        self.engine.rememberColor(col)
+        self.echo_guard += 1
+        try:
+            view.setForeGroundColor(self.managedColor(col))
+            if bg is not None:
+                view.setBackGroundColor(self.managedColor(bg))
+        finally:
+            self.echo_guard -= 1
+        if record:
+            self.recordHistory(origin)
+        return col
 
-            # fraction of full circle for current step
-            step_fraction = (self.abs_step % (self.max_steps * sensitivity_used)) / (self.max_steps * sensitivity_used)
 
-            # absolute hue is anchored at last picked color
-            new_hue = (self.h_anchor + step_fraction) % 1.0
-            newcol = QColor.fromHsvF(new_hue, col.hsvSaturationF(), col.valueF())
+    def managedColor(self, col):
+        return self.color_cache.lookup((col, self.documentContext()),
+                                       lambda: ManagedColor.fromQColor(QColor.fromRgbF(*col)))
 
-            self.setNewFGColor(newcol)
-            # don't change h_anchor here; it's supposed to remain the pick anchor
-            self.resetRelMode(newcol)
 
-        else:
-            deg = ((direction % (self.rel_max_steps * self.getSensitivity())) /
-                (self.rel_max_steps * self.getSensitivity())) * self.rel_revs
-            self.setNewFGColor(self.rotateHue(deg, col, self.h))
-            self.resetRelMode(col)
+    def refreshPaletteIndex(self):
+        """Rebuild the nearest-swatch index of config.snap_palette if the palette changed (None while
+        snapping is off or the palette is missing). Runs on the idle timer, never on a write."""
+        if not self.config.snap_palette:
+            self.palette_timer.stop()
+            self.palette_index = self.palette_signature = None
+            return
+        resource = Application.resources("palette").get(self.config.snap_palette)
+        signature = zlib.crc32(bytes(resource.data())) if resource is not None else None
+        if signature != self.palette_signature:
+            self.palette_signature = signature
+            self.palette_index = self.buildPaletteIndex(resource) if resource is not None else None
+        if not self.palette_timer.isActive():
+            self.palette_timer.start()
+
+
+    def buildPaletteIndex(self, resource):
+        from krita import Palette
+        from .paletteIndex import PaletteIndex
+        palette = Palette(resource)
+        colors = []
+        for i in range(palette.colorsCountTotal()):
+            swatch = palette.colorSetEntryByIndex(i)
+            if swatch is not None and swatch.isValid():
+                colors.append(self.managedToColor(swatch.color()))
+        self.toast(f"Snapping to palette '{resource.name()}' ({len(colors)} colors)")
+        return PaletteIndex(colors)
+
+
+    def cycleColorSource(self):
+        source = (self.config.cycle_source + 1) % len(SOURCE_NAMES)
+        self.config.update(cycle_source=source)
+        self.toast(f"Hue actions now cycle {SOURCE_NAMES[source]}")
+
+
+    def activeLayer(self):
+        """(document, node, node key) of the active layer, or None."""
+        doc = Application.activeDocument()
+        node = doc.activeNode() if doc else None
+        if node is None:
+            return None
+        return doc, node, node.uniqueId().toString()
+
+
+    def checkLayerFormat(self, node):
+        from .dominantColors import numpy, RGBA_LAYOUTS
+        if numpy is None:
+            self.toast("Sampling the layer needs NumPy")
+            return False
+        if node.colorModel() != "RGBA" or node.colorDepth() not in RGBA_LAYOUTS:
+            self.toast("Sampling works on RGBA layers only")
+            return False
+        return True
+
+
+    def stepDominant(self, direction):
+        """Move `direction` colors through the active layer's dominant colors (sampled in the background)."""
+        self.flushSteps()
+        layer = self.activeLayer()
+        if layer is None:
+            return
+        doc, node, key = layer
+        now = monotonic()
+        known = self.dominant is not None and self.dominant[0] == key
+        if not known or now - self.dominant_tick >= dominant_resample_idle:
+            # an unchanged layer comes back from the worker's cache
+            self.sampleDominant(doc, node, key)
+        self.dominant_tick = now
+        if not known or not self.dominant[1]:
+            self.dominant_waiting = direction       # stepped once the colors arrive
+            return
 
+        colors = self.dominant[1]
+        self.dominant_index = (self.dominant_index + direction) % len(colors)
+        col = colors[self.dominant_index]
+        start = self.getCurFGColor()
+        self.engine.resyncFromColor(col)            # hue/SV steps continue from the picked color
+        self.setNewFGColor(col, start)
+        self.toast(f"Dominant color {self.dominant_index + 1}/{len(colors)}", VERBOSITY_STEPS)
+        self.publishState()
 
-    def rotateHue(self,ix,col,h):        # 0...max_steps-1, starting at the top (start_pos)
-        sv = [col.hsvSaturationF(),col.valueF()]
-        self.updateHue((ix + h) % 1.0,col.hsvSaturationF())
-        return QColor.fromHsvF(self.h,*sv)
 
+    def sampleDominant(self, doc, node, key):
+        """Read a sample of the layer (within the selection, if any) and hand it to the dominant-color worker."""
+        from .dominantColors import DominantColorWorker, readRows, sampleStride
+        if not self.checkLayerFormat(node):
+            return
+        rect = node.bounds()
+        selection = doc.selection()
+        if selection is not None:
+            rect = rect.intersected(QRect(selection.x(), selection.y(), selection.width(), selection.height()))
+        if rect.isEmpty():
+            self.toast("Nothing to sample on this layer")
+            return
 
-    def shiftSV(self, mode_sv, direction):
-        col = self.getCurFGColor()
+        x, y, w, h = rect.x(), rect.y(), rect.width(), rect.height()
+        stride = sampleStride(w, h)
+        data, rows = readRows(node.pixelData, x, y, w, h, stride)
+        mask = readRows(selection.pixelData, x, y, w, h, stride)[0] if selection is not None else None
+        if self.dominant_worker is None:
+            self.dominant_worker = DominantColorWorker(self.dominantReady.emit)
+        self.dominant_worker.submit(key, data, w, rows, node.colorDepth(), self.config.dominant_count, mask, stride)
 
-        # Safeguard: if the saturation/value configuration isn't defined, initialize them with defaults.
-        if not hasattr(self, 'sat_num_steps'):
-            self.sat_num_steps = 30    # Default number of saturation steps.
-        if not hasattr(self, 'val_num_steps'):
-            self.val_num_steps = 30    # Default number of value steps.
-        if not hasattr(self, 'sat_step_size'):
-            self.sat_step_size = 255.0 / self.sat_num_steps
-        if not hasattr(self, 'val_step_size'):
-            self.val_step_size = 255.0 / self.val_num_steps
-        if not hasattr(self, 'sv_step'):
-            self.sv_step = [0, 0]
-        if not hasattr(self, 'sv_new_step'):
-            self.sv_new_step = [0, 0]
-
-        # Only reset the SV step counters if the saturation/value mode has changed.
-        if self.testSVModeChanged(mode_sv):
-            self.resetSV(col, mode_sv)
-
-        # Optionally update relative mode if an external color change is detected.
-        if self.testColorChanged(col):
-            self.resyncFromColor(col)
-
-        # Determine the maximum number of steps for the selected channel.
-        max_steps_channel = self.sat_num_steps if mode_sv == 0 else self.val_num_steps
-
-        # Increment the step counter for the given channel and clamp it.
-        self.sv_step[mode_sv] += direction
-        self.sv_step[mode_sv] = self.between(self.sv_step[mode_sv], 0, max_steps_channel)
-
-        # Calculate new saturation and value from the step counters.
-        new_sat = int(round(self.between(self.sv_step[0] * self.sat_step_size, 0, 255)))
-        new_val = int(round(self.between(self.sv_step[1] * self.val_step_size, 0, 255)))
-
-        # Update the foreground color using the current hue, new saturation, and new value.
-        self.setNewFGColor(QColor.fromHsv(int(self.h * 360), new_sat, new_val))
-
-
-    def setNewFGColor(self,col):
-        view = Application.activeWindow().activeView()
-        view.setForeGroundColor(ManagedColor.fromQColor(col))
-        self.prev_col = col
-        return col
+
+    def onDominantReady(self, key, colors):
+        if isinstance(colors, Exception):
+            self.dominant_waiting = 0
+            self.toast(f"Sampling dominant colors failed: {type(colors).__name__}: {colors}")
+            return
+        if self.dominant is None or self.dominant[0] != key:
+            self.dominant_index = -1
+        self.dominant = (key, colors)
+        if not colors:
+            self.toast("No opaque pixels to sample")
+        elif self.dominant_waiting:
+            direction, self.dominant_waiting = self.dominant_waiting, 0
+            self.stepDominant(direction)
+
+
+    def stepLayerHue(self, direction):
+        """Jump `direction` occupied hue bins of the active layer's histogram, keeping S/V."""
+        self.flushSteps()
+        layer = self.activeLayer()
+        if layer is None:
+            return
+        doc, node, key = layer
+        now = monotonic()
+        known = self.layer_hues is not None and self.layer_hues[0] == key
+        if not known or now - self.layer_hues_tick >= dominant_resample_idle:
+            self.sampleLayerHues(node, key)
+        self.layer_hues_tick = now
+        if not known:
+            self.layer_hues_waiting = direction
+            return
+
+        from .hueHistogram import nextHue
+        start = self.getCurFGColor()
+        if self.engine.testColorChanged(start):
+            self.engine.resyncFromColor(start)
+        hue = nextHue(self.layer_hues[1], self.engine.h, direction)
+        if hue is None:
+            self.toast("No colored pixels on this layer")
+            return
+        self.setNewFGColor(self.engine.jumpHue(start, hue), start)
+        self.toast(f"Hue {hue * 360:.0f}", VERBOSITY_STEPS)
+        self.publishState()
 
 
-    def getCurFGColor(self):
-        view = Application.activeWindow().activeView()
-        return view.foregroundColor().colorForCanvas(None)
+    def sampleLayerHues(self, node, key):
+        """Read a sample of the layer and let the histogram worker fold in the tiles that changed."""
+        from .dominantColors import readRows, sampleStride
+        from .hueHistogram import HueHistogramWorker, max_samples
+        if not self.checkLayerFormat(node):
+            return
+        bounds = node.bounds()
+        rect = (bounds.x(), bounds.y(), bounds.width(), bounds.height())
+        stride = sampleStride(rect[2], rect[3], max_samples)
+        data = readRows(node.pixelData, *rect, stride)[0]      # one call per sampled row, full width
+        if self.hue_worker is None:
+            self.hue_worker = HueHistogramWorker(self.layerHuesReady.emit)
+        self.hue_worker.submit(key, data, rect, node.colorDepth(), stride)
+
+
+    def onLayerHuesReady(self, key, hues):
+        if isinstance(hues, Exception):
+            self.layer_hues_waiting = 0
+            self.toast(f"Sampling layer hues failed: {type(hues).__name__}: {hues}")
+            return
+        self.layer_hues = (key, hues)
+        if self.layer_hues_waiting:
+            direction, self.layer_hues_waiting = self.layer_hues_waiting, 0
+            self.stepLayerHue(direction)
 
 
-    def updateHue(self,h,s):      # prevent -1 hue when going 0 saturation or brightness
-        if (s > 0):
-            self.h = max(h,0)
+    def cycleBackgroundMode(self):
+        mode = (self.config.bg_mode + 1) % len(BG_MODE_NAMES)
+        self.config.update(bg_mode=mode)
+        self.toast(f"Background pairing: {BG_MODE_NAMES[mode]}")
 
 
-    def getStartPos(self):      # start_pos is hour hand on a clock. def= 12 o'clock
-        return (start_pos % 12) / 12 + 0.25
+    def recordHistory(self, origin=None):
+        """Push the engine's color and step state; bursts of writes merge into the newest entry."""
+        history = self.history
+        if origin is not None:
+            self.recordOrigin(origin)
+        floats, ints = self.engine.packState()
+        history.push(floats, ints + (0,))
 
 
-    def getSensitivity(self):
-        return sensitivity_fine if (self.tog_fine) else sensitivity
+    def recordOrigin(self, col):
+        """Push `col` as a color picked outside the cycler, unless it's the current history entry already."""
+        current = self.history.current()
+        if current is None or colorKey(current[0][:3]) != colorKey(col):
+            self.history.push(tuple(col) + (0.0,) * len(HISTORY_FLOAT_FIELDS),
+                              (0,) * HISTORY_INT_WIDTH + (1,), merge=False)
 
 
-    def toggleFine(self):
-        self.resetRelMode(self.getCurFGColor())
-        if (self.tog_fine):
-            self.abs_step = self.abs_step_before_fine + self.abs_step - self.abs_step_before_fine * (sensitivity_fine / sensitivity)
-            self.abs_step_before_fine = 0
+    def undoColor(self):
+        self.flushSteps()
+        # A color picked since the last write becomes the entry redo returns to
+        self.recordOrigin(self.getCurFGColor())
+        self.restoreHistory(self.history.undo(), "Oldest color in history")
+
+
+    def redoColor(self):
+        self.flushSteps()
+        self.restoreHistory(self.history.redo(), "Newest color in history")
+
+
+    def restoreHistory(self, entry, limit_msg):
+        if entry is None:
+            self.toast(limit_msg)
+            return
+        floats, ints = entry
+        if ints[-1]:
+            col = tuple(floats[:3])
+            self.engine.resyncFromColor(col)
         else:
-            self.abs_step_before_fine = self.abs_step
-            self.abs_step = self.abs_step_before_fine * (sensitivity_fine / sensitivity)
-        self.tog_fine = not self.tog_fine
-        if (show_mesg):
-            self.toast(f"Fine mode is now toggled [{'on' if (self.tog_fine) else 'off'}]")
+            col = self.engine.unpackState(floats, ints[:-1])
+        self.setNewFGColor(col, record=False)
+        self.toast(f"History {self.history.cursor + 1}/{len(self.history)}", VERBOSITY_STEPS)
+        self.publishState()
+
 
+    def getCurFGColor(self, view=None):
+        """Read the foreground color of `view` (default: the active view) as an engine (r, g, b) color."""
+        view = view or Application.activeWindow().activeView()
+        managed = view.foregroundColor()
+        key = (tuple(managed.components()), managed.colorModel(), managed.colorDepth(), managed.colorProfile())
+        return self.color_cache.lookup(key, lambda: self.managedToColor(managed))
 
-    def toast(self,msg):
-        Application.activeWindow().activeView().showFloatingMessage(msg, QIcon(), 300, 1)
-        print(f"[BetterColorCycler] {msg}")
 
+    def managedToColor(self, managed):
+        qcol = managed.colorForCanvas(None)
+        return (qcol.redF(), qcol.greenF(), qcol.blueF())
 
-    def lcm(self,a,b):
-        return abs(a*b) // gcd(a,b)
 
+    def getStartPos(self):      # start_pos is hour hand on a clock. def= 12 o'clock
+        return (self.config.start_pos % 12) / 12 + 0.25
 
-    def between(self, n, lower, upper):
-        return max(lower, min(n, upper))
+
+    def toggleFine(self):
+        self.flushSteps()
+        self.recordCommand("fine", 1)
+        tog_fine = self.engine.toggleFine(self.getCurFGColor())
+        self.toast(f"Fine mode is now toggled [{'on' if (tog_fine) else 'off'}]")
+        self.publishState()
+
+
+    def toast(self, msg, level=VERBOSITY_INFO):
+        self.messages.post(msg, level)
+
+
+    def showMessage(self, msg):
+        win = Application.activeWindow()
+        view = win.activeView() if win else None
+        if view:
+            view.showFloatingMessage(msg, QIcon(), 300, 1)
+
+
+    def stepMessage(self):
+        """Absolute step counter, with the fine offset when fine mode was entered mid-way."""
+        engine = self.engine
+        if (engine.abs_step_before_fine == 0):
+            return f"{engine.abs_step}"
+        offset = engine.abs_step - engine.abs_step_before_fine * engine.fine_ratio
+        return f"{engine.abs_step_before_fine} ({int(offset):+})"
 
 
     def showSettingsDialog(self):
-        from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QSpinBox, QPushButton
-        from PyQt5.QtCore import QSettings
+        if self.settings_dialog is None:
+            self.settings_dialog = self.buildSettingsDialog()
+        dialog, spins = self.settings_dialog
+
+        # Start from the current configuration every time the dialog opens.
+        for name, spin in spins.items():
+            spin.setValue(getattr(self.config, name))
+        dialog.exec_()
+
+
+    def buildSettingsDialog(self):
+        from PyQt5.QtWidgets import QDialog, QVBoxLayout, QSpinBox, QPushButton
 
         dialog = QDialog()
         dialog.setWindowTitle("BetterColorCycler Settings")
@@ -386,82 +1112,51 @@ class BetterColorCycler(krita.Extension):
         # Create spin boxes for each configuration parameter.
         hue_spin = QSpinBox()
         hue_spin.setRange(1, 360)
-        hue_spin.setValue(self.max_steps)  # current value if available
         layout.addLayout(self.createRow("Hue Steps:", hue_spin))
 
         sat_spin = QSpinBox()
         sat_spin.setRange(1, 255)
-        sat_spin.setValue(self.sat_num_steps if hasattr(self, 'sat_num_steps') else 30)
         layout.addLayout(self.createRow("Saturation Steps:", sat_spin))
 
         val_spin = QSpinBox()
         val_spin.setRange(1, 255)
-        val_spin.setValue(self.val_num_steps if hasattr(self, 'val_num_steps') else 30)
         layout.addLayout(self.createRow("Value Steps:", val_spin))
 
+        # Device parameters (saved with the device profiles)
+        angle_spin = QSpinBox()
+        angle_spin.setRange(1, 180)
+        angle_spin.setSuffix("\u00b0")
+        layout.addLayout(self.createRow("Relative Step Angle:", angle_spin))
+
+        sens_spin = QSpinBox()
+        sens_spin.setRange(1, 16)
+        layout.addLayout(self.createRow("Sensitivity:", sens_spin))
+
+        fine_spin = QSpinBox()
+        fine_spin.setRange(1, 64)
+        layout.addLayout(self.createRow("Fine Sensitivity:", fine_spin))
+
+        spins = {"hue_steps": hue_spin, "sat_steps": sat_spin, "val_steps": val_spin,
+                 "angle_rel": angle_spin, "sensitivity": sens_spin, "sensitivity_fine": fine_spin}
+
         apply_btn = QPushButton("Apply Settings")
         layout.addWidget(apply_btn)
 
-        # Get QSettings instance.
-        settings = QSettings()
-
-        # This is where you put your code:
         apply_btn.clicked.connect(lambda: (
-            settings.setValue("BetterColorCycler/hue_steps", hue_spin.value()),
-            settings.setValue("BetterColorCycler/sat_steps", sat_spin.value()),
-            settings.setValue("BetterColorCycler/val_steps", val_spin.value()),
-            setattr(self, "max_steps", hue_spin.value()),
-            setattr(self, "sat_num_steps", sat_spin.value()),
-            setattr(self, "val_num_steps", val_spin.value()),
-            setattr(self, "sat_step_size", 255.0 / sat_spin.value()),  # Adjust according to saturation steps
-            setattr(self, "val_step_size", 255.0 / val_spin.value()),
-            self.toast("Settings applied. They will persist across restarts."),
+            self.config.update(**{name: spin.value() for name, spin in spins.items()}),
             dialog.accept()
         ))
 
-        dialog.exec_()
+        return dialog, spins
 
 
-    def createRow(label_text, current_value):
-        label = QLabel(label_text)
-        spin = QSpinBox()
-        spin.setRange(1, 360)
-        spin.setValue(current_value)
+    def createRow(self, label_text, widget):
+        from PyQt5.QtWidgets import QHBoxLayout, QLabel
         row = QHBoxLayout()
-        row.addWidget(label)
-        row.addWidget(spin)
-        return spin, row
-
-        settings = QSettings()
-
-        hue_steps = settings.value("BetterColorCycler/hue_steps", max_steps, type=int)
-        sv_steps = settings.value("BetterColorCycler/sv_steps", 30, type=int)
-
-        hue_spin, row1 = createRow("Hue Steps", hue_steps)
-        sat_spin, row2 = createRow("Saturation Steps", sv_steps)
-        val_spin, row3 = createRow("Value Steps", sv_steps)
-
-        layout.addLayout(row1)
-        layout.addLayout(row2)
-        layout.addLayout(row3)
-
-        apply_btn = QPushButton("Apply")
-        apply_btn.clicked.connect(lambda: (
-            settings.setValue("BetterColorCycler/hue_steps", hue_spin.value()),
-            settings.setValue("BetterColorCycler/sv_steps", sat_spin.value()),
-            setattr(self, "max_steps", hue_spin.value()),
-            setattr(self, "sv_num_steps", val_spin.value()),
-            setattr(self, "sv_step_size", 256 / val_spin.value()),
-            self.toast("Settings applied. Restart Krita for full effect."),
-            dialog.accept()
-        ))
-
-        layout.addWidget(apply_btn)
-        dialog.setLayout(layout)
-        dialog.exec_()
+        row.addWidget(QLabel(label_text))
+        row.addWidget(widget)
+        return row
 
 
     def updateHueSettings(self, newHueSteps):
-        # Update your internal variable for hue steps.
-        self.max_steps = newHueSteps
-        self.toast(f"Hue steps updated to {newHueSteps}")
+        self.config.update(hue_steps=newHueSteps)
@@ -1,6 +1,13 @@
-from krita import DockWidget
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QSpinBox, QGroupBox
-from PyQt5.QtCore import QSettings
+from krita import DockWidget, Krita
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, QPushButton, QLabel, QSpinBox,
+                             QDoubleSpinBox, QComboBox, QGroupBox, QPlainTextEdit, QLineEdit, QGridLayout,
+                             QInputDialog)
+from PyQt5.QtGui import QFontDatabase
+
+from .cyclerBus import sharedBus
+from .cyclerConfig import sharedConfig, MACRO_SLOTS
+from .deviceProfiles import parseProfiles
+from .stepCurves import CHANNELS, CURVE_PRESETS, parseCurve
 
 class BetterColorCyclerDocker(DockWidget):
     def __init__(self):
@@ -8,28 +15,57 @@ class BetterColorCyclerDocker(DockWidget):
         self.setObjectName("BetterColorCyclerDocker")
         self.setWindowTitle("Better Color Cycler Steps")
 
+        # Contents are built the first time the docker is shown, not at Krita startup.
+        self.built = False
+
+    def showEvent(self, event):
+        if not self.built:
+            self.built = True
+            self.buildContents()
+        self.refreshPalettes()      # palettes may have been added or removed while hidden
+        super().showEvent(event)
+
+    def buildContents(self):
         # Create container and layout.
         container = QWidget()
         layout = QVBoxLayout(container)
 
-        # Get persisted values.
-        settings = QSettings()
-        currentHue = settings.value("BetterColorCycler/hue_steps", 60, type=int)
-        currentSat = settings.value("BetterColorCycler/sat_steps", 30, type=int)
-        currentVal = settings.value("BetterColorCycler/val_steps", 30, type=int)
+        # Shared configuration; the spin boxes follow it when it's changed elsewhere.
+        self.config = sharedConfig()
+        self.config.changed.connect(self.onConfigChanged)
 
-        # Create spin boxes using persisted values.
+        # Create spin boxes using the current values.
         self.spinHue = QSpinBox()
         self.spinHue.setRange(1, 360)
-        self.spinHue.setValue(currentHue)
 
         self.spinSat = QSpinBox()
         self.spinSat.setRange(1, 255)
-        self.spinSat.setValue(currentSat)
 
         self.spinVal = QSpinBox()
         self.spinVal.setRange(1, 255)
-        self.spinVal.setValue(currentVal)
+
+        # Acceleration curve; these take effect as soon as they're edited.
+        self.accelGroup = QGroupBox("Acceleration")
+        self.accelGroup.setCheckable(True)
+        self.spinAccelThreshold = QSpinBox()
+        self.spinAccelThreshold.setRange(1, 100)
+        self.spinAccelThreshold.setSuffix(" ticks/s")
+        self.spinAccelGain = QDoubleSpinBox()
+        self.spinAccelGain.setRange(0.0, 20.0)
+        self.spinAccelGain.setSingleStep(0.25)
+        self.spinAccelCurve = QDoubleSpinBox()
+        self.spinAccelCurve.setRange(0.25, 4.0)
+        self.spinAccelCurve.setSingleStep(0.25)
+        self.spinAccelMax = QSpinBox()
+        self.spinAccelMax.setRange(1, 360)
+        self.spinAccelMax.setSuffix(" steps")
+        self.onConfigChanged(None)
+
+        self.accelGroup.toggled.connect(lambda on: self.config.update(accel_enabled=on))
+        self.spinAccelThreshold.valueChanged.connect(lambda v: self.config.update(accel_threshold_hz=v))
+        self.spinAccelGain.valueChanged.connect(lambda v: self.config.update(accel_gain=v))
+        self.spinAccelCurve.valueChanged.connect(lambda v: self.config.update(accel_curve=v))
+        self.spinAccelMax.valueChanged.connect(lambda v: self.config.update(accel_max=v))
 
         # Add your configuration widgets into the layout.
         configLayout = QHBoxLayout()
@@ -47,23 +83,242 @@ class BetterColorCyclerDocker(DockWidget):
         applyBtn.clicked.connect(self.applyConfiguration)
         layout.addWidget(applyBtn)
 
+        # Device profiles: switching applies a saved set of stepping settings at once.
+        profileLayout = QHBoxLayout()
+        profileLayout.addWidget(QLabel("Device:"))
+        self.profileCombo = QComboBox()
+        self.profileCombo.activated.connect(self.onProfileActivated)
+        profileLayout.addWidget(self.profileCombo, 1)
+        saveProfileBtn = QPushButton("Save as...")
+        saveProfileBtn.clicked.connect(self.saveProfile)
+        deleteProfileBtn = QPushButton("Delete")
+        deleteProfileBtn.clicked.connect(lambda: self.callExtension(
+            lambda ext: ext.deleteProfile(self.profileCombo.currentData() or "")))
+        profileLayout.addWidget(saveProfileBtn)
+        profileLayout.addWidget(deleteProfileBtn)
+        layout.addLayout(profileLayout)
+        self.syncProfiles()
+
+        # Snap steps to the swatches of a palette.
+        snapLayout = QHBoxLayout()
+        snapLayout.addWidget(QLabel("Snap to palette:"))
+        self.paletteCombo = QComboBox()
+        self.paletteCombo.currentIndexChanged.connect(
+            lambda i: self.config.update(snap_palette=self.paletteCombo.itemData(i) or ""))
+        snapLayout.addWidget(self.paletteCombo, 1)
+        layout.addLayout(snapLayout)
+
+        # Step curves per channel: pick a preset or type a spec; malformed specs are refused.
+        curvesGroup = QGroupBox("Step curves")
+        curvesLayout = QFormLayout(curvesGroup)
+        self.curveCombos = {}
+        for channel, label in zip(CHANNELS, ("Hue:", "Sat:", "Val:")):
+            combo = QComboBox()
+            combo.setEditable(True)
+            combo.addItems(CURVE_PRESETS)
+            combo.setInsertPolicy(QComboBox.NoInsert)
+            combo.lineEdit().editingFinished.connect(lambda channel=channel: self.commitCurve(channel))
+            combo.activated.connect(lambda _, channel=channel: self.commitCurve(channel))
+            curvesLayout.addRow(label, combo)
+            self.curveCombos[channel] = combo
+        self.syncCurves()
+        layout.addWidget(curvesGroup)
+
+        accelLayout = QFormLayout(self.accelGroup)
+        accelLayout.addRow("Starts at:", self.spinAccelThreshold)
+        accelLayout.addRow("Gain:", self.spinAccelGain)
+        accelLayout.addRow("Curve:", self.spinAccelCurve)
+        accelLayout.addRow("Max per tick:", self.spinAccelMax)
+        layout.addWidget(self.accelGroup)
+
+        # Live stepping state pushed by the extension over the bus.
+        stateLayout = QHBoxLayout()
+        self.stateLabel = QLabel("No steps yet")
+        stateLayout.addWidget(self.stateLabel, 1)
+        self.lastRunLabel = QLabel()            # the latest applied run, as a macro command
+        stateLayout.addWidget(self.lastRunLabel)
+        fineBtn = QPushButton("Fine")
+        fineBtn.clicked.connect(lambda: self.bus.actionRequested.emit("toggle_fine"))
+        resetBtn = QPushButton("Reset")
+        resetBtn.clicked.connect(lambda: self.bus.actionRequested.emit("reset_step_counter"))
+        stateLayout.addWidget(fineBtn)
+        stateLayout.addWidget(resetBtn)
+        layout.addLayout(stateLayout)
+
+        # Macros: "name: commands" per slot, editable; Rec records shortcut steps into the slot.
+        macroGroup = QGroupBox("Macros")
+        macroLayout = QGridLayout(macroGroup)
+        self.macroEdits = {}
+        self.macroRecButtons = {}
+        for slot in range(1, MACRO_SLOTS + 1):
+            edit = QLineEdit()
+            edit.setPlaceholderText(f"Macro {slot}: hue +3; sat -2")
+            edit.editingFinished.connect(lambda slot=slot, edit=edit: self.config.update(**{f"macro_{slot}": edit.text()}))
+            playBtn = QPushButton("Play")
+            playBtn.clicked.connect(lambda _, slot=slot: self.bus.actionRequested.emit(f"bcc_macro_{slot}"))
+            recBtn = QPushButton("Rec")
+            recBtn.setCheckable(True)
+            recBtn.clicked.connect(lambda _, slot=slot: self.callExtension(lambda ext: ext.toggleRecording(slot)))
+            macroLayout.addWidget(edit, slot - 1, 0)
+            macroLayout.addWidget(playBtn, slot - 1, 1)
+            macroLayout.addWidget(recBtn, slot - 1, 2)
+            self.macroEdits[slot] = edit
+            self.macroRecButtons[slot] = recBtn
+        self.syncMacros()
+        layout.addWidget(macroGroup)
+
+        # Hue ring / SV square preview of the same state (imported here: it pulls in NumPy)
+        from .ringPreview import RingPreview
+        self.preview = RingPreview()
+        layout.addWidget(self.preview)
+
+        self.bus = sharedBus()
+        self.bus.stateChanged.connect(self.onStateChanged)
+        self.bus.stepped.connect(self.onStepped)
+        # a docker created before the extension is registered fills in once it is
+        self.bus.extensionRegistered.connect(lambda ext: self.onStateChanged(ext.stateSnapshot()))
+        self.callExtension(lambda ext: self.onStateChanged(ext.stateSnapshot()))
+
+        # Per-action timings collected by the extension's profiler; the group's check box turns it on.
+        self.timingsGroup = timingsGroup = QGroupBox("Timings")
+        timingsGroup.setCheckable(True)
+        timingsGroup.setChecked(self.config.profiling)
+        timingsGroup.toggled.connect(lambda on: self.config.update(profiling=on))
+        timingsLayout = QVBoxLayout(timingsGroup)
+        self.timingsView = QPlainTextEdit()
+        self.timingsView.setReadOnly(True)
+        self.timingsView.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        timingsLayout.addWidget(self.timingsView)
+        timingsButtons = QHBoxLayout()
+        refreshBtn = QPushButton("Refresh")
+        refreshBtn.clicked.connect(self.refreshTimings)
+        dumpBtn = QPushButton("Dump to File")
+        dumpBtn.clicked.connect(lambda: self.callExtension(lambda ext: ext.dumpProfile()))
+        timingsButtons.addWidget(refreshBtn)
+        timingsButtons.addWidget(dumpBtn)
+        timingsLayout.addLayout(timingsButtons)
+        layout.addWidget(timingsGroup)
+
         # (Add other parts of your Docker UI as needed...)
 
         self.setWidget(container)
 
     def applyConfiguration(self):
-        newHueSteps = self.spinHue.value()
-        newSatSteps = self.spinSat.value()
-        newValSteps = self.spinVal.value()
-        # Pass these values to your extension via a callback.
-        self.callExtension(lambda ext: ext.updateConfiguration(newHueSteps, newSatSteps, newValSteps))
+        # The extension is subscribed to the config and reconfigures itself; saving is deferred.
+        self.config.update(hue_steps=self.spinHue.value(),
+                           sat_steps=self.spinSat.value(),
+                           val_steps=self.spinVal.value())
+
+    def onConfigChanged(self, changed):
+        for spin, value in ((self.spinHue, self.config.hue_steps),
+                            (self.spinSat, self.config.sat_steps),
+                            (self.spinVal, self.config.val_steps),
+                            (self.spinAccelThreshold, self.config.accel_threshold_hz),
+                            (self.spinAccelGain, self.config.accel_gain),
+                            (self.spinAccelCurve, self.config.accel_curve),
+                            (self.spinAccelMax, self.config.accel_max)):
+            spin.blockSignals(True)
+            spin.setValue(value)
+            spin.blockSignals(False)
+        self.accelGroup.blockSignals(True)
+        self.accelGroup.setChecked(self.config.accel_enabled)
+        self.accelGroup.blockSignals(False)
+        if changed and "profiling" in changed:
+            self.timingsGroup.blockSignals(True)
+            self.timingsGroup.setChecked(self.config.profiling)
+            self.timingsGroup.blockSignals(False)
+            self.refreshTimings()
+        if changed and "snap_palette" in changed:
+            self.refreshPalettes()
+        if changed and any(name.startswith("macro_") for name in changed):
+            self.syncMacros()
+        if changed and any(name.endswith("_curve") for name in changed):
+            self.syncCurves()
+        if changed and changed & {"device_profiles", "active_profile"}:
+            self.syncProfiles()
+
+    def syncProfiles(self):
+        self.profileCombo.blockSignals(True)
+        self.profileCombo.clear()
+        self.profileCombo.addItem("(unsaved)", "")
+        for name in sorted(parseProfiles(self.config.device_profiles)):
+            self.profileCombo.addItem(name, name)
+        self.profileCombo.setCurrentIndex(max(0, self.profileCombo.findData(self.config.active_profile)))
+        self.profileCombo.blockSignals(False)
+
+    def onProfileActivated(self, index):
+        name = self.profileCombo.itemData(index)
+        if name:
+            self.callExtension(lambda ext: ext.switchProfile(name))
+
+    def saveProfile(self):
+        name, ok = QInputDialog.getText(self, "Save Device Profile", "Profile name:",
+                                        text=self.config.active_profile)
+        if ok and name.strip():
+            self.callExtension(lambda ext: ext.saveProfile(name.strip()))
+
+    def commitCurve(self, channel):
+        combo = self.curveCombos[channel]
+        spec = combo.currentText().strip()
+        try:
+            parseCurve(spec, channel)
+        except ValueError as e:
+            combo.setToolTip(str(e))
+            self.syncCurves()
+            return
+        combo.setToolTip("")
+        self.config.update(**{f"{channel}_curve": spec})
+
+    def syncCurves(self):
+        for channel, combo in self.curveCombos.items():
+            spec = getattr(self.config, f"{channel}_curve")
+            if combo.currentText() != spec:
+                combo.blockSignals(True)
+                combo.setEditText(spec)
+                combo.blockSignals(False)
+
+    def syncMacros(self):
+        for slot, edit in self.macroEdits.items():
+            text = getattr(self.config, f"macro_{slot}")
+            if edit.text() != text:
+                edit.setText(text)
+
+    def refreshPalettes(self):
+        names = sorted(Krita.instance().resources("palette"))
+        if self.config.snap_palette and self.config.snap_palette not in names:
+            names.append(self.config.snap_palette)      # keep showing a setting whose palette is gone
+        self.paletteCombo.blockSignals(True)
+        self.paletteCombo.clear()
+        self.paletteCombo.addItem("Off", "")
+        for name in names:
+            self.paletteCombo.addItem(name, name)
+        self.paletteCombo.setCurrentIndex(max(0, self.paletteCombo.findData(self.config.snap_palette)))
+        self.paletteCombo.blockSignals(False)
+
+    def onStateChanged(self, state):
+        sat, val = state["sv_step"]
+        fine = " (fine)" if state["tog_fine"] else ""
+        accel = f" x{state['accel']}" if state["accel"] > 1 else ""
+        self.stateLabel.setText(f"Step {float(state['abs_step']):g}/{state['max_steps']}{fine}{accel}  "
+                                f"S {sat}/{state['sat_num_steps']}  V {val}/{state['val_num_steps']}")
+        self.preview.setState(state)
+        for slot, recBtn in self.macroRecButtons.items():
+            recBtn.setChecked(state["recording"] == slot)
+
+    def onStepped(self, kind, arg, count):
+        if kind == "hue":
+            verb = "abs" if arg else "hue"
+        else:
+            verb = "sat" if arg == 0 else "val"
+        self.lastRunLabel.setText(f"{verb} {float(count):+g}")
+
+    def refreshTimings(self):
+        self.callExtension(lambda ext: self.timingsView.setPlainText(ext.profileReport()))
 
     def callExtension(self, callback):
-        from krita import Krita
-        for ext in Krita.instance().extensions():
-            if ext.__class__.__name__ == "BetterColorCycler":
-                callback(ext)
-                break
+        # Direct handle from the bus; nothing to do until __init__.py has registered the extension.
+        if self.bus.extension is not None:
+            callback(self.bus.extension)
 
     def canvasChanged(self, canvas):
         # Required override – no action needed for now.
@@ -0,0 +1,96 @@
+from array import array
+from time import monotonic
+
+# Undo/redo history of the colors the cycler wrote. Entries are fixed-width records of
+# floats and ints stored in two flat arrays used as a ring, so push, undo and redo are O(1)
+# and the memory use is fixed by the capacity: no per-entry objects are kept. What a record
+# holds is up to the caller (the extension stores the color plus the engine's step state).
+#
+# Entries pushed within `merge_ms` of each other replace the newest entry instead of adding
+# one, so a fast dial spin leaves a single entry for where it stopped.
+
+
+class ColorHistory:
+
+    def __init__(self, capacity=64, float_width=1, int_width=1, merge_ms=400):
+        self.float_width = float_width
+        self.int_width = int_width
+        self.merge_ms = merge_ms
+        self.resize(capacity)
+
+
+    def resize(self, capacity):
+        """Set the capacity; the history is emptied."""
+        self.capacity = max(1, capacity)
+        self.floats = array("d", bytes(8 * self.capacity * self.float_width))
+        self.ints = array("i", bytes(array("i").itemsize * self.capacity * self.int_width))
+        self.start = 0          # ring slot of the oldest entry
+        self.size = 0           # entries stored (including the ones undone)
+        self.cursor = -1        # index of the current entry, 0 = oldest
+        self.last_push = -1e9
+        self.mergeable = False  # whether the newest entry may be replaced by a merging push
+
+
+    def clear(self):
+        self.start = 0
+        self.size = 0
+        self.cursor = -1
+        self.mergeable = False
+
+
+    def push(self, floats, ints, merge=True):
+        """Record a new current entry, dropping the undone ones after the cursor (and the oldest when full)."""
+        now = monotonic()
+        if (merge and self.mergeable and self.cursor == self.size - 1
+                and (now - self.last_push) * 1000.0 < self.merge_ms):
+            self.write(self.cursor, floats, ints)
+        else:
+            self.size = self.cursor + 1
+            if self.size == self.capacity:
+                self.start = (self.start + 1) % self.capacity
+                self.size -= 1
+            self.size += 1
+            self.cursor = self.size - 1
+            self.write(self.cursor, floats, ints)
+        self.last_push = now
+        self.mergeable = merge
+
+
+    def write(self, index, floats, ints):
+        slot = (self.start + index) % self.capacity
+        fw, iw = self.float_width, self.int_width
+        self.floats[slot * fw:(slot + 1) * fw] = array("d", floats)
+        self.ints[slot * iw:(slot + 1) * iw] = array("i", ints)
+
+
+    def entry(self, index):
+        """(floats, ints) of entry `index` (0 = oldest)."""
+        slot = (self.start + index) % self.capacity
+        fw, iw = self.float_width, self.int_width
+        return tuple(self.floats[slot * fw:(slot + 1) * fw]), tuple(self.ints[slot * iw:(slot + 1) * iw])
+
+
+    def current(self):
+        return self.entry(self.cursor) if self.cursor >= 0 else None
+
+
+    def undo(self):
+        """Move back one entry and return it, or None at the oldest entry."""
+        if self.cursor <= 0:
+            return None
+        self.cursor -= 1
+        self.mergeable = False
+        return self.entry(self.cursor)
+
+
+    def redo(self):
+        """Move forward one entry and return it, or None at the newest entry."""
+        if self.cursor >= self.size - 1:
+            return None
+        self.cursor += 1
+        self.mergeable = False
+        return self.entry(self.cursor)
+
+
+    def __len__(self):
+        return self.size
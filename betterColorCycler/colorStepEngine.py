@@ -0,0 +1,421 @@
+from fractions import Fraction
+from math import gcd
+import colorsys
+
+from .lruCache import LRUCache
+from .stepCurves import channelLevels, HueWarp, isLinear, stepForCode
+
+# Pure-Python hue/SV stepping state machine behind the BetterColorCycler extension.
+# It knows nothing about Krita or Qt: colors go in and come out as (r, g, b) float tuples
+# in the 0..1 range, so the stepping logic can be driven and profiled outside Krita.
+#
+# The step state is exact: the current hue and the absolute ring's anchor are whole
+# counts of hue units (1 / hue_units of a turn, a lattice every step size lands on) from
+# the hue of the last picked color, and saturation/value are step indices. A tick is
+# integer arithmetic; colors are only derived from the state when one is output, and the
+# state is only derived from a color when the color changed outside the engine. Full
+# rotations come back to the exact start, however many ticks they take.
+#
+# Step curves (stepCurves) only change the tables the state is read through: the SV step
+# levels, and for hue a warp that maps positions (pick_coord plus hue_pos units, in turns)
+# to hues, anchored so position pick_coord is the picked hue itself.
+
+
+def lcm(a, b):
+    return abs(a*b) // gcd(a, b)
+
+
+def exact(value):
+    """A Fraction as an int when it's whole, so the common case stays plain integer arithmetic."""
+    return int(value) if isinstance(value, Fraction) and value.denominator == 1 else value
+
+
+def between(n, lower, upper):
+    return max(lower, min(n, upper))
+
+
+def colorKey(col):
+    """Packed 0xRRGGBB integer key of a color, the same precision QColor.name() compares at."""
+    return (int(col[0] * 255 + 0.5) << 16) | (int(col[1] * 255 + 0.5) << 8) | int(col[2] * 255 + 0.5)
+
+
+def keyChannels(key):
+    """Unpack a colorKey() back into its 8-bit (r, g, b) channels."""
+    return ((key >> 16) & 0xff, (key >> 8) & 0xff, key & 0xff)
+
+
+# Per-canvas stepping state, as saved/restored by saveState()/restoreState(). hue_units
+# (from the profile) comes last: restoring into a profile with another lattice rescales
+# the positions instead of setting it.
+STATE_FIELDS = ("prev_col", "prev_key", "abs_step", "abs_step_before_fine", "tog_fine", "pick_hue",
+                "pick_coord", "hue_pos", "anchor_pos", "cur_s", "cur_v", "sv_step", "sv_prev_mode", "pair_base",
+                "hue_units")
+
+# Flat record of the current color and step state for the color history: packState() gives
+# 3 + len(HISTORY_FLOAT_FIELDS) floats (r, g, b first) and HISTORY_INT_WIDTH ints.
+# The counters are stored as floats too, they may be fractions for uneven fine factors.
+HISTORY_FLOAT_FIELDS = ("pick_hue", "pick_coord", "cur_s", "cur_v", "hue_pos", "anchor_pos", "abs_step",
+                        "abs_step_before_fine", "hue_units")
+HISTORY_COUNTER_FIELDS = ("hue_pos", "anchor_pos", "abs_step", "abs_step_before_fine")
+HISTORY_INT_WIDTH = 4       # sv_step (2), tog_fine, sv_prev_mode (-1 = none)
+
+
+# Attributes of a StepProfile that the engine reads directly; useProfile() points them at a
+# compiled profile.
+PROFILE_ATTRIBUTES = ("max_steps", "sat_num_steps", "val_num_steps", "angle_rel", "sensitivity",
+                      "sensitivity_fine", "curves", "fine_ratio", "rel_max_steps", "hue_units",
+                      "sat_codes", "val_codes", "sat_levels", "val_levels", "hue_warp", "hue_rings", "sv_grids")
+
+
+def profileKey(max_steps, sat_num_steps, val_num_steps, angle_rel, sensitivity, sensitivity_fine, curves):
+    """Identity of a step configuration, as StepProfile normalizes it."""
+    return (max(1, max_steps), max(1, sat_num_steps), max(1, val_num_steps), max(1, angle_rel),
+            max(1, sensitivity), max(1, sensitivity_fine), tuple(curves))
+
+
+class StepProfile:
+    """A step configuration (step counts, relative angle, sensitivities, curves) with everything
+    derived from it compiled up front, so an engine can switch to it without recomputing."""
+
+    def __init__(self, max_steps=60, sat_num_steps=30, val_num_steps=30, angle_rel=15,
+                 sensitivity=1, sensitivity_fine=4, curves=("linear", "linear", "linear"), table_cache_size=32):
+        (self.max_steps, self.sat_num_steps, self.val_num_steps, self.angle_rel,
+         self.sensitivity, self.sensitivity_fine, self.curves) = profileKey(
+            max_steps, sat_num_steps, val_num_steps, angle_rel, sensitivity, sensitivity_fine, curves)
+
+        # Fine mode rescales the absolute step counter by this (an int unless the factors don't divide)
+        self.fine_ratio = exact(Fraction(self.sensitivity_fine, self.sensitivity))
+
+        # Relative steps come back to the start after rel_max_steps (times the sensitivity)
+        self.rel_max_steps = lcm(self.angle_rel, 360) // self.angle_rel
+
+        # Hue lattice: every absolute ring position and every relative step, coarse and fine,
+        # is a whole number of units (and so is every degree)
+        self.hue_units = 1
+        for sens in (self.sensitivity, self.sensitivity_fine):
+            self.hue_units = lcm(self.hue_units, lcm(self.max_steps * sens, 360 * sens))
+
+        # Curve tables: 8-bit SV levels per step index and the hue warp (None = linear)
+        hue_curve, sat_curve, val_curve = self.curves
+        self.sat_codes = self.curveLevels(sat_curve, self.sat_num_steps, "sat")
+        self.val_codes = self.curveLevels(val_curve, self.val_num_steps, "val")
+        self.sat_levels = [code / 255 for code in self.sat_codes]
+        self.val_levels = [code / 255 for code in self.val_codes]
+        try:
+            self.hue_warp = None if isLinear(hue_curve) else HueWarp(hue_curve)
+        except ValueError:
+            self.hue_warp = None
+
+        # Lazily filled step tables: absolute hue rings per (anchor, S, V, positions) and
+        # SV colors per hue, both LRU-bounded. They stay with the profile, so switching back
+        # to a profile finds them warm.
+        self.hue_rings = LRUCache(table_cache_size)
+        self.sv_grids = LRUCache(table_cache_size)
+
+
+    def curveLevels(self, spec, num_steps, channel):
+        try:
+            return channelLevels(spec, num_steps, channel)
+        except ValueError:      # a malformed spec steps linearly
+            return channelLevels("linear", num_steps, channel)
+
+
+    def key(self):
+        return profileKey(self.max_steps, self.sat_num_steps, self.val_num_steps, self.angle_rel,
+                          self.sensitivity, self.sensitivity_fine, self.curves)
+
+
+class ColorStepEngine:
+
+    def __init__(self, max_steps=60, sat_num_steps=30, val_num_steps=30,
+                 angle_rel=15, sensitivity=1, sensitivity_fine=4, table_cache_size=32):
+        # Last color the engine produced or synced to, plus its key so change tests are one int compare
+        self.prev_col = None
+        self.prev_key = None
+
+        # Hue tracking: the hue and the ring anchor are hue_pos / anchor_pos hue units past pick_hue
+        self.abs_step = 0
+        self.abs_step_before_fine = 0
+        self.tog_fine = False
+        self.pick_hue = 0.0
+        self.pick_coord = 0.0       # position of pick_hue on the hue curve, in turns
+        self.hue_pos = 0
+        self.anchor_pos = 0
+
+        # Hue of the last externally picked color; mirrored background hues turn around it
+        self.pair_base = 0.0
+
+        # Saturation/value of the current color (0..1): the picked color's until an SV step,
+        # then the levels of the sv_step indices
+        self.cur_s = 0.0
+        self.cur_v = 0.0
+
+        # SV tracking
+        self.sv_step = [0, 0]
+        self.sv_prev_mode = None
+
+        # Device / step configuration and its tables (see StepProfile)
+        self.table_cache_size = table_cache_size
+        self.profile = None
+        self.useProfile(StepProfile(max_steps, sat_num_steps, val_num_steps, angle_rel,
+                                    sensitivity, sensitivity_fine, table_cache_size=table_cache_size))
+
+
+    def useProfile(self, profile):
+        """Switch to a compiled StepProfile; positions already taken carry over exactly."""
+        old = self.profile
+        if profile is old:
+            return
+        self.profile = profile
+        for name in PROFILE_ATTRIBUTES:
+            setattr(self, name, getattr(profile, name))
+        self.adoptPositions(profile.hue_units if old is None else old.hue_units)
+
+
+    def adoptPositions(self, units):
+        """Bring hue positions taken on a lattice of `units` and possibly another hue curve
+        onto the current profile."""
+        if units != self.hue_units:
+            self.hue_pos = exact(Fraction(self.hue_pos) * self.hue_units / units)
+            self.anchor_pos = exact(Fraction(self.anchor_pos) * self.hue_units / units)
+        # keep the picked hue where it is on the current curve
+        self.pick_coord = self.hue_warp.position(self.pick_hue) if self.hue_warp else 0.0
+
+
+    def hueRingColor(self, index, positions):
+        """Color at `index` of the absolute ring anchored at anchor_pos with the current S/V, filled on demand."""
+        ring = self.hue_rings.lookup((self.pick_hue, self.anchor_pos, self.cur_s, self.cur_v, positions),
+                                     lambda: [None] * positions)
+        newcol = ring[index]
+        if newcol is None:
+            hue = self.hueAt(self.anchor_pos + index * (self.hue_units // positions))
+            newcol = ring[index] = self.fromHsv(hue, self.cur_s, self.cur_v)
+        return newcol
+
+
+    def svGridColor(self, hue, sat_index, val_index):
+        """Color for the given SV step indices at a hue, filled on demand."""
+        grid = self.sv_grids.lookup(hue, dict)
+        newcol = grid.get((sat_index, val_index))
+        if newcol is None:
+            newcol = grid[(sat_index, val_index)] = self.fromHsv(
+                hue, self.sat_levels[sat_index], self.val_levels[val_index])
+        return newcol
+
+
+    def hueAt(self, pos):
+        """Hue (0..1) `pos` hue units past the picked hue, through the hue curve."""
+        warp = self.hue_warp
+        if warp is None:
+            return (self.pick_hue + pos / self.hue_units) % 1.0
+        return (self.pick_hue + warp.hue(self.pick_coord + pos / self.hue_units) - warp.hue(self.pick_coord)) % 1.0
+
+
+    @property
+    def h(self):
+        """Current hue (0..1), derived from the exact state."""
+        return self.hueAt(self.hue_pos)
+
+
+    @property
+    def h_anchor(self):
+        """Hue where absolute step 0 sits on the ring."""
+        return self.hueAt(self.anchor_pos)
+
+
+    def saveState(self):
+        """Snapshot of the per-canvas state (not the configuration or tables)."""
+        return tuple(list(value) if isinstance(value, list) else value
+                     for value in (getattr(self, name) for name in STATE_FIELDS))
+
+
+    def restoreState(self, state):
+        for name, value in zip(STATE_FIELDS[:-1], state):
+            setattr(self, name, list(value) if isinstance(value, list) else value)
+        self.adoptPositions(state[-1])
+
+
+    def packState(self):
+        """(floats, ints) record of the current color and step state, see HISTORY_FLOAT_FIELDS."""
+        floats = tuple(self.prev_col) + tuple(getattr(self, name) for name in HISTORY_FLOAT_FIELDS)
+        ints = (*self.sv_step, int(self.tog_fine), -1 if self.sv_prev_mode is None else self.sv_prev_mode)
+        return floats, ints
+
+
+    def unpackState(self, floats, ints):
+        """Restore a packState() record; returns its color."""
+        col = tuple(floats[:3])
+        values = dict(zip(HISTORY_FLOAT_FIELDS, floats[3:]))
+        units = int(values.pop("hue_units"))
+        for name, value in values.items():
+            setattr(self, name, value)
+        # step counters are stored as floats; bring them back to exact ints / fractions
+        for name in HISTORY_COUNTER_FIELDS:
+            value = getattr(self, name)
+            setattr(self, name, exact(Fraction(value).limit_denominator(units)))
+        self.adoptPositions(units)
+        self.sv_step = list(ints[0:2])
+        self.tog_fine = bool(ints[2])
+        self.sv_prev_mode = None if ints[3] < 0 else ints[3]
+        self.rememberColor(col)
+        return col
+
+
+    def forgetColor(self):
+        """Treat the next color seen as an external change, so stepping resyncs from it."""
+        self.prev_col = None
+        self.prev_key = None
+
+
+    def toHsv(self, col):
+        return colorsys.rgb_to_hsv(*col)
+
+
+    def fromHsv(self, h, s, v):
+        return colorsys.hsv_to_rgb(h, s, v)
+
+
+    def rememberColor(self, col):
+        self.prev_col = col
+        self.prev_key = colorKey(col)
+
+
+    def testColorChanged(self, col):        # color must have changed outside the engine
+        return self.prev_key != colorKey(col)
+
+
+    def resyncFromColor(self, col):
+        """Reset all state from the given color (the only place a color is decomposed)."""
+        h, s, v = self.toHsv(col)
+
+        # Reset hue tracking
+        self.pick_hue = h
+        self.pick_coord = self.hue_warp.position(h) if self.hue_warp else 0.0
+        self.hue_pos = 0
+        self.anchor_pos = 0
+        self.pair_base = h
+        self.cur_s = s
+        self.cur_v = v
+        self.abs_step = 0
+        self.abs_step_before_fine = 0
+
+        # Reset SV tracking
+        self.sv_prev_mode = None
+        self.sv_step = [stepForCode(self.sat_codes, int(round(s * 255))),
+                        stepForCode(self.val_codes, int(round(v * 255)))]
+
+        # Remember this color
+        self.rememberColor(col)
+
+
+    def reanchor(self, hue_pos):
+        """Move the hue to `hue_pos` units and anchor the absolute ring there (a relative step)."""
+        self.hue_pos = self.anchor_pos = hue_pos % self.hue_units
+        self.abs_step = 0
+        self.abs_step_before_fine = 0
+
+
+    def resetSteps(self):
+        self.abs_step = 0
+
+
+    def getSensitivity(self):
+        return self.sensitivity_fine if (self.tog_fine) else self.sensitivity
+
+
+    def stepHue(self, col, mode_abs, direction):
+        """Advance the hue state by `direction` ticks from `col` and return the resulting color."""
+        # Always resync if the color changed outside the engine (picker, palette, etc.)
+        if self.testColorChanged(col):
+            self.resyncFromColor(col)
+
+        if mode_abs:
+            self.abs_step += direction
+
+            # position on the ring of max_steps * sensitivity steps, anchored at anchor_pos
+            positions = self.max_steps * self.getSensitivity()
+            index = self.abs_step % positions
+            self.hue_pos = (self.anchor_pos + index * (self.hue_units // positions)) % self.hue_units
+
+            # whole positions come from the ring table
+            if index == int(index):
+                newcol = self.hueRingColor(int(index), positions)
+            else:
+                newcol = self.fromHsv(self.h, self.cur_s, self.cur_v)
+        else:
+            # relative steps re-anchor absolute mode at the new hue (not the pairing base)
+            units = self.hue_units * self.angle_rel // (360 * self.getSensitivity())
+            self.reanchor(self.hue_pos + direction * units)
+            newcol = self.fromHsv(self.h, self.cur_s, self.cur_v)
+
+        self.rememberColor(newcol)
+        return newcol
+
+
+    def setAbsStep(self, col, n):
+        """Go to absolute step `n` of the ring; returns (color, steps moved). Like stepHue, a color
+        changed outside the engine is synced first, so `n` counts from its anchor."""
+        if self.testColorChanged(col):
+            self.resyncFromColor(col)
+        delta = n - self.abs_step
+        return self.stepHue(col, True, delta), delta
+
+
+    def jumpHue(self, col, hue):
+        """Move to `hue` (0..1) keeping the current saturation/value; re-anchors like a relative step."""
+        if self.testColorChanged(col):
+            self.resyncFromColor(col)
+        # the target becomes the new pick hue, exact even where the color carries no hue (greys)
+        self.pick_hue = hue % 1.0
+        self.pick_coord = self.hue_warp.position(self.pick_hue) if self.hue_warp else 0.0
+        self.reanchor(0)
+        newcol = self.fromHsv(self.pick_hue, self.cur_s, self.cur_v)
+        self.rememberColor(newcol)
+        return newcol
+
+
+    def pairedColor(self, mirror, offset):
+        """Background color for joint stepping: the current S/V at the current hue plus `offset`
+        (in turns), or with the hue mirrored around pair_base so it moves against the foreground."""
+        h = 2 * self.pair_base - self.h if mirror else self.h
+        return self.fromHsv((h + offset) % 1.0, self.cur_s, self.cur_v)
+
+
+    def shiftSV(self, col, mode_sv, direction):
+        """Advance the saturation (0) or value (1) step counter and return the resulting color."""
+        # Resync everything if an external color change is detected; otherwise the step
+        # indices are exact already, also when switching between saturation and value.
+        if self.testColorChanged(col):
+            self.resyncFromColor(col)
+        self.sv_prev_mode = mode_sv
+
+        # Determine the maximum number of steps for the selected channel.
+        max_steps_channel = self.sat_num_steps if mode_sv == 0 else self.val_num_steps
+
+        # Increment the step counter for the given channel and clamp it.
+        self.sv_step[mode_sv] += direction
+        self.sv_step[mode_sv] = between(self.sv_step[mode_sv], 0, max_steps_channel)
+
+        # Look up the color for the current hue and the new saturation/value steps.
+        newcol = self.svGridColor(self.h, self.sv_step[0], self.sv_step[1])
+        self.cur_s = self.sat_levels[self.sv_step[0]]
+        self.cur_v = self.val_levels[self.sv_step[1]]
+        self.rememberColor(newcol)
+        return newcol
+
+
+    def toggleFine(self, col):
+        """Switch fine mode, rescaling the absolute step counter so the dial position is kept."""
+        if self.testColorChanged(col):
+            self.resyncFromColor(col)
+        ratio = self.fine_ratio
+        if (self.tog_fine):
+            self.abs_step = self.abs_step_before_fine + self.abs_step - self.abs_step_before_fine * ratio
+            self.abs_step_before_fine = 0
+        else:
+            self.abs_step_before_fine = self.abs_step
+            self.abs_step = self.abs_step_before_fine * ratio
+        self.abs_step = exact(self.abs_step)
+        self.abs_step_before_fine = exact(self.abs_step_before_fine)
+        self.tog_fine = not self.tog_fine
+        return self.tog_fine
@@ -0,0 +1,86 @@
+from collections import deque
+import socket
+import threading
+
+from .stepCommands import parseCommands
+
+# Optional UDP endpoint on localhost for hardware dials / MIDI bridges that want to send
+# steps faster than keyboard shortcuts allow. A datagram holds one or more commands in the
+# stepCommands syntax ("hue +7; sat -3").
+#
+# A reader thread parses datagrams into (verb, count) tuples and appends them to a deque
+# (append/popleft are atomic, so no lock is taken). It calls `wake` once per batch; the
+# extension drains the queue on the Qt main thread.
+
+
+class ControllerServer:
+
+    def __init__(self, port, wake=None, host="127.0.0.1"):
+        self.host = host
+        self.port = port
+        self.wake = wake                # called from the reader thread when new commands are queued
+        self.queue = deque()
+        self.wake_pending = False
+        self.received = 0               # datagrams
+        self.sock = None
+        self.thread = None
+
+
+    def start(self):
+        """Bind the socket and start the reader thread; raises OSError if the port is taken."""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # room for a few hundred datagrams while the reader thread waits for the GIL
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.sock.bind((self.host, self.port))
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self.run, name="BetterColorCyclerController", daemon=True)
+        self.thread.start()
+        return self.port
+
+
+    def stop(self):
+        sock, self.sock = self.sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        if self.thread is not None:
+            self.thread.join(1.0)
+            self.thread = None
+
+
+    def run(self):
+        sock = self.sock
+        while True:
+            try:
+                data = sock.recv(4096)
+            except OSError:
+                return          # socket closed by stop()
+            if not data:
+                if self.sock is None:
+                    return
+                continue
+            self.received += 1
+            commands = parseCommands(data)
+            if not commands:
+                continue
+            self.queue.extend(commands)
+            if not self.wake_pending:
+                self.wake_pending = True
+                if self.wake is not None:
+                    self.wake()
+
+
+    def drain(self):
+        """Take every queued command (main thread)."""
+        # Clear the flag first: anything appended after this point triggers a new wake.
+        self.wake_pending = False
+        queue = self.queue
+        commands = []
+        while True:
+            try:
+                commands.append(queue.popleft())
+            except IndexError:
+                return commands
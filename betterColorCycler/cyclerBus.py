@@ -0,0 +1,47 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# Direct link between the extension and the docker(s). __init__.py registers the extension
+# once; dockers get it from bus.extension (or from extensionRegistered if they come first)
+# instead of scanning Krita.instance().extensions(). Live updates flow as Qt signals in both
+# directions; configuration changes travel through cyclerConfig's own changed signal.
+
+
+class CyclerBus(QObject):
+
+    extensionRegistered = pyqtSignal(object)    # the BetterColorCycler extension
+    stateChanged = pyqtSignal(object)           # extension -> docker: dict from stateSnapshot()
+    stepped = pyqtSignal(str, object, object)   # extension -> docker: (kind, arg, count) of an applied run;
+                                                # count is a Fraction for abs-set off the step lattice
+    actionRequested = pyqtSignal(str)           # docker -> extension: name of an action from loadActions
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.extension = None
+
+
+    def registerExtension(self, extension):
+        self.extension = extension
+        self.actionRequested.connect(extension.runAction)
+        self.extensionRegistered.emit(extension)
+
+
+    def publishState(self, extension):
+        """Emit stateChanged, building the snapshot only when someone is listening."""
+        if self.receivers(self.stateChanged):
+            self.stateChanged.emit(extension.stateSnapshot())
+
+
+    def publishSteps(self, ticks):
+        if self.receivers(self.stepped):
+            for kind, arg, count in ticks:
+                self.stepped.emit(kind, arg, count)
+
+
+_shared = None
+
+
+def sharedBus():
+    global _shared
+    if _shared is None:
+        _shared = CyclerBus()
+    return _shared
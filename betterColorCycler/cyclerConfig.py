@@ -0,0 +1,116 @@
+from PyQt5.QtCore import QObject, QSettings, QTimer, pyqtSignal
+
+# Single in-memory configuration shared by the extension, the docker and the settings
+# dialog. QSettings is read once; readers use plain attributes (config.hue_steps), writers
+# call update(), which notifies subscribers through `changed` right away and persists the
+# changed keys to QSettings after a short quiet period (write-behind).
+
+SETTINGS_GROUP = "BetterColorCycler"
+
+# name -> (type, default). The only place these defaults are defined.
+FIELDS = {
+    "hue_steps": (int, 60),             # steps for a full hue rotation in absolute mode
+    "sat_steps": (int, 30),             # steps across the saturation range
+    "val_steps": (int, 30),             # steps across the value range
+    "angle_rel": (int, 15),             # degrees per relative hue step
+    "sensitivity": (int, 1),            # absolute ring positions per hue step
+    "sensitivity_fine": (int, 4),       # the same in fine mode
+    "start_pos": (int, 12),             # hour-hand position of hue 0 on the dial, 12 = top
+    "coalesce_ms": (int, 16),           # dial ticks within this window share one color write, 0 = every tick
+    "verbosity": (int, 1),              # 0 off, 1 info, 2 also step counters
+    "toast_interval_ms": (int, 250),    # minimum time between canvas messages
+    "profiling": (bool, False),         # per-action latency histograms
+    "controller_port": (int, 0),        # localhost UDP port for external dial commands, 0 = off
+    "accel_enabled": (bool, False),     # scale step size with the tick rate of fast shortcut repeats
+    "accel_threshold_hz": (int, 8),     # tick rate where acceleration starts
+    "accel_gain": (float, 1.0),         # extra steps per tick at twice the threshold rate
+    "accel_curve": (float, 2.0),        # exponent of the rate curve, 1 = linear
+    "accel_max": (int, 16),             # most steps a single tick may move
+    "history_capacity": (int, 64),      # colors kept for undo/redo
+    "history_merge_ms": (int, 400),     # writes closer together than this share one history entry
+    "bg_mode": (int, 0),                # background follows the foreground: 0 off, 1 hue offset, 2 mirrored
+    "bg_hue_offset": (int, 180),        # background hue offset in degrees
+    "snap_palette": (str, ""),          # name of the palette resource steps snap to, "" = off
+    "cycle_source": (int, 0),           # what the hue actions step through: 0 hue, 1 the layer's dominant
+                                        # colors, 2 the hues used in the layer
+    "dominant_count": (int, 8),         # dominant colors sampled from a layer
+    "hue_curve": (str, "linear"),       # step curves (see stepCurves): linear, gamma <g>, perceptual,
+    "sat_curve": (str, "linear"),       # or points <step>:<value>, ...
+    "val_curve": (str, "linear"),
+    "device_profiles": (str, ""),       # named device profiles, see deviceProfiles
+    "active_profile": (str, ""),        # the profile last switched to, "" = none
+}
+
+# Recorded macros, one field per slot: "name: commands" in the stepCommands syntax
+MACRO_SLOTS = 5
+FIELDS.update({f"macro_{slot}": (str, "") for slot in range(1, MACRO_SLOTS + 1)})
+
+
+class CyclerConfig(QObject):
+
+    changed = pyqtSignal(object)        # set of field names whose value changed
+
+    def __init__(self, write_delay_ms=1000, parent=None):
+        super().__init__(parent)
+        for name, (kind, default) in FIELDS.items():
+            setattr(self, name, default)
+        self.loaded = False
+        self.dirty = set()
+        self.write_timer = QTimer(self)
+        self.write_timer.setSingleShot(True)
+        self.write_timer.setInterval(write_delay_ms)
+        self.write_timer.timeout.connect(self.flush)
+
+
+    def load(self):
+        """Read every field from QSettings (once; later calls are no-ops)."""
+        if self.loaded:
+            return self
+        settings = QSettings()
+        for name, (kind, default) in FIELDS.items():
+            setattr(self, name, settings.value(f"{SETTINGS_GROUP}/{name}", default, type=kind))
+        self.loaded = True
+        return self
+
+
+    def update(self, **values):
+        """Change fields in memory, notify subscribers and schedule persistence; returns the changed names."""
+        changed = set()
+        for name, value in values.items():
+            if name not in FIELDS:
+                raise KeyError(f"Unknown BetterColorCycler setting: {name}")
+            value = FIELDS[name][0](value)
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                changed.add(name)
+        if changed:
+            self.dirty |= changed
+            self.write_timer.start()
+            self.changed.emit(changed)
+        return changed
+
+
+    def flush(self):
+        """Write pending changes to QSettings now."""
+        self.write_timer.stop()
+        if not self.dirty:
+            return
+        settings = QSettings()
+        for name in self.dirty:
+            settings.setValue(f"{SETTINGS_GROUP}/{name}", getattr(self, name))
+        self.dirty.clear()
+
+
+    def values(self):
+        return {name: getattr(self, name) for name in FIELDS}
+
+
+_shared = None
+
+
+def sharedConfig():
+    """The plugin-wide configuration, loaded from QSettings on first use."""
+    global _shared
+    if _shared is None:
+        _shared = CyclerConfig().load()
+    return _shared
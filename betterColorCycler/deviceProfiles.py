@@ -0,0 +1,32 @@
+import json
+
+# Named device profiles: the full set of stepping settings for one input device (a 24-detent
+# dial, a 60-step dial, keyboard shortcuts, ...). They are kept in config.device_profiles as
+# JSON, {name: {field: value}}, with the fields below. Switching to a profile writes its
+# values into the live config fields; the extension compiles each profile's step tables
+# when the profiles are loaded, so the engine switch itself is a pointer swap.
+
+PROFILE_FIELDS = ("hue_steps", "sat_steps", "val_steps", "angle_rel", "sensitivity", "sensitivity_fine",
+                  "start_pos", "hue_curve", "sat_curve", "val_curve", "coalesce_ms", "accel_enabled",
+                  "accel_threshold_hz", "accel_gain", "accel_curve", "accel_max")
+
+
+def parseProfiles(text):
+    """{name: {field: value}} from config.device_profiles; unknown fields and malformed text are ignored."""
+    try:
+        data = json.loads(text) if text.strip() else {}
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {str(name): {field: values[field] for field in PROFILE_FIELDS if field in values}
+            for name, values in data.items() if isinstance(values, dict)}
+
+
+def formatProfiles(profiles):
+    return json.dumps(profiles, sort_keys=True)
+
+
+def profileValues(config):
+    """The profile fields of the live configuration."""
+    return {field: getattr(config, field) for field in PROFILE_FIELDS}
@@ -0,0 +1,116 @@
+import math
+import zlib
+
+from .backgroundWorker import BackgroundWorker
+from .lruCache import LRUCache
+
+try:
+    import numpy
+except ImportError:         # dominant-color cycling is unavailable without NumPy
+    numpy = None
+
+# Dominant colors of a layer for the "dominant colors" cycling source. The extension reads
+# every n-th row of the layer on the UI thread (the only part that has to touch Krita, so it
+# copies no more than it samples) and hands the bytes to a worker thread, which views them as
+# a NumPy array without copying, takes every n-th column, clusters the sample with mini-batch
+# k-means and reports the cluster centers, largest first. Results are cached per (node,
+# content checksum, count, stride), so asking again for an unchanged layer only costs the
+# checksum.
+
+max_samples = 20000
+batch_size = 1024
+iterations = 60
+result_cache_size = 16
+
+# pixelData() layouts of the RGBA color depths: (numpy dtype, channel order, full scale)
+RGBA_LAYOUTS = {
+    "U8": ("u1", (2, 1, 0, 3), 255.0),          # stored as BGRA
+    "U16": ("<u2", (2, 1, 0, 3), 65535.0),      # stored as BGRA
+    "F16": ("<f2", (0, 1, 2, 3), 1.0),
+    "F32": ("<f4", (0, 1, 2, 3), 1.0),
+}
+
+
+def sampleStride(width, height, samples=max_samples):
+    """Pixel stride, in both directions, that samples about `samples` pixels of a width x height rect."""
+    return max(1, math.ceil(math.sqrt(width * height / samples)))
+
+
+def readRows(pixelData, x, y, width, height, stride):
+    """(data, rows): the rect's rows at multiples of `stride`, read with a Krita pixelData(x, y, w, h)
+    method and joined, so a large layer costs the UI thread about 1/stride of a full read."""
+    if stride == 1:
+        return pixelData(x, y, width, height), height
+    rows = range(y + (-y) % stride, y + height, stride)
+    return b"".join(pixelData(x, row, width, 1) for row in rows), len(rows)
+
+
+def samplePixels(data, width, height, depth, mask=None, stride=1):
+    """(n, 3) float32 RGB samples (0..1) of the opaque-enough pixels in an RGBA pixelData() buffer,
+    taking every `stride`-th column (readRows() already took every `stride`-th row).
+
+    `mask` is an optional 8-bit selection buffer of the same size; unselected pixels are skipped.
+    """
+    dtype, order, scale = RGBA_LAYOUTS[depth]
+    pixels = numpy.frombuffer(data, dtype=dtype, count=width * height * 4).reshape(height, width, 4)
+    sample = pixels[:, ::stride].reshape(-1, 4)             # views until here
+    keep = sample[:, order[3]] > 0.5 * scale
+    if mask is not None:
+        selected = numpy.frombuffer(mask, dtype="u1", count=width * height).reshape(height, width)
+        keep &= selected[:, ::stride].reshape(-1) > 127
+    return (sample[keep][:, list(order[:3])].astype(numpy.float32) / numpy.float32(scale)).clip(0.0, 1.0)
+
+
+def miniBatchKMeans(samples, k, seed=0):
+    """Cluster centers of `samples`, largest cluster first, as a list of (r, g, b) tuples."""
+    if len(samples) == 0:
+        return []
+    rng = numpy.random.default_rng(seed)
+    k = min(k, len(samples))
+
+    # k-means++ seeding on a subsample
+    pool = samples[rng.choice(len(samples), min(len(samples), 20 * k), replace=False)]
+    centers = [pool[rng.integers(len(pool))]]
+    nearest = ((pool - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = nearest.sum()
+        if total <= 0:
+            break           # fewer distinct colors than k
+        centers.append(pool[rng.choice(len(pool), p=nearest / total)])
+        nearest = numpy.minimum(nearest, ((pool - centers[-1]) ** 2).sum(axis=1))
+    centers = numpy.array(centers, dtype=numpy.float32)
+    counts = numpy.zeros(len(centers), dtype=numpy.float32)
+
+    # mini-batch updates: each center moves to the running mean of the points assigned to it
+    for _ in range(iterations):
+        batch = samples[rng.integers(len(samples), size=min(batch_size, len(samples)))]
+        labels = ((batch[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        hits = numpy.bincount(labels, minlength=len(centers)).astype(numpy.float32)
+        sums = numpy.zeros_like(centers)
+        numpy.add.at(sums, labels, batch)
+        counts += hits
+        moved = hits > 0
+        centers[moved] += (sums[moved] - hits[moved, None] * centers[moved]) / counts[moved, None]
+
+    labels = ((samples[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    sizes = numpy.bincount(labels, minlength=len(centers))
+    return [tuple(float(c) for c in centers[i]) for i in numpy.argsort(-sizes) if sizes[i] > 0]
+
+
+class DominantColorWorker(BackgroundWorker):
+    """Computes dominant colors in a background thread, with results cached by content."""
+
+    def __init__(self, done):
+        super().__init__(done, "BetterColorCyclerDominant")
+        self.results = LRUCache(result_cache_size)      # only used from the worker thread
+
+
+    def submit(self, key, data, width, height, depth, count, mask=None, stride=1):
+        super().submit(key, self.compute, key, data, width, height, depth, count, mask, stride)
+
+
+    def compute(self, key, data, width, height, depth, count, mask, stride):
+        checksum = zlib.crc32(data, zlib.crc32(mask) if mask is not None else 0)
+        return self.results.lookup(
+            (key, checksum, count, stride),
+            lambda: miniBatchKMeans(samplePixels(data, width, height, depth, mask, stride), count))
@@ -0,0 +1,137 @@
+import zlib
+
+from .backgroundWorker import BackgroundWorker
+from .lruCache import LRUCache
+from .dominantColors import numpy, RGBA_LAYOUTS
+
+# Hue histogram of a layer for the "hues used in this layer" cycling source. The extension
+# reads every n-th row of the layer, full width, in one pixelData() call per row (n grows with
+# the layer so a read stays near max_samples pixels); the worker cuts the rows into fixed
+# tiles aligned to the canvas and counts every n-th column. Rows and columns sit at multiples
+# of n, so tiles sample the same pixels from one update to the next; each tile's bin counts are kept with a checksum
+# of its bytes, so an update only recomputes the tiles whose pixels changed (Krita doesn't
+# report dirty regions to Python) and adjusts the totals by the difference. Pixels that are
+# transparent, or too grey or dark to have a meaningful hue, aren't counted.
+#
+# The worker thread owns the histograms; the main thread gets a copy of the occupied bin
+# hues after each update and looks up the next/previous one per tick.
+
+tile_size = 256
+hue_bins = 180          # 2 degree bins
+min_chroma = 0.08       # max - min channel, 0..1
+min_share = 0.002       # bins holding less than this share of the counted pixels are noise
+max_samples = 250000    # pixels sampled per layer
+histogram_cache_size = 8
+
+
+def tileRects(x, y, width, height):
+    """(x, y, w, h) of the canvas-aligned tiles covering the given rectangle, clipped to it."""
+    right, bottom = x + width, y + height
+    for ty in range(y - y % tile_size, bottom, tile_size):
+        for tx in range(x - x % tile_size, right, tile_size):
+            left, top = max(tx, x), max(ty, y)
+            yield left, top, min(tx + tile_size, right) - left, min(ty + tile_size, bottom) - top
+
+
+def sampledTiles(data, x, y, width, height, stride):
+    """(x, y, w, rows, data) of the canvas-aligned tiles in a readRows() buffer of the given rect."""
+    first = y + (-y) % stride
+    rows = len(range(first, y + height, stride))
+    if not rows or not width:
+        return
+    buffer = numpy.frombuffer(data, dtype="u1").reshape(rows, -1)
+    pixel_bytes = buffer.shape[1] // width
+    for left, top, w, h in tileRects(x, y, width, height):
+        lo = max(0, -(-(top - first) // stride))
+        hi = max(0, -(-(top + h - first) // stride))
+        if lo < hi:
+            tile = buffer[lo:hi, (left - x) * pixel_bytes:(left - x + w) * pixel_bytes]
+            yield left, top, w, hi - lo, tile.tobytes()
+
+
+def hueCounts(data, width, height, depth, first=0, stride=1):
+    """Hue bin counts of an RGBA pixelData() buffer, counting every `stride`-th column from `first`."""
+    dtype, order, scale = RGBA_LAYOUTS[depth]
+    pixels = numpy.frombuffer(data, dtype=dtype, count=width * height * 4).reshape(height, width, 4)
+    pixels = pixels[:, first::stride].reshape(-1, 4)
+    pixels = pixels[pixels[:, order[3]] > 0.5 * scale]
+    rgb = pixels[:, list(order[:3])].astype(numpy.float32) / numpy.float32(scale)
+    high = rgb.max(axis=1)
+    chroma = high - rgb.min(axis=1)
+    keep = chroma >= min_chroma
+    rgb, high, chroma = rgb[keep], high[keep], chroma[keep]
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    # hue in sextants, as colorsys does it
+    hue = numpy.where(high == r, (g - b) / chroma,
+                      numpy.where(high == g, 2.0 + (b - r) / chroma, 4.0 + (r - g) / chroma))
+    bins = ((hue / 6.0) % 1.0 * hue_bins).astype(numpy.int64) % hue_bins
+    return numpy.bincount(bins, minlength=hue_bins)
+
+
+class NodeHueHistogram:
+
+    def __init__(self):
+        self.counts = numpy.zeros(hue_bins, dtype=numpy.int64)
+        self.tiles = {}         # (x, y) -> (checksum, counts)
+
+
+    def update(self, tiles, depth, stride=1):
+        """Bring the histogram up to date with a full list of (x, y, w, h, data) tiles, read every
+        `stride`-th row (see readRows); returns tiles recomputed."""
+        recomputed = 0
+        seen = set()
+        for x, y, w, h, data in tiles:
+            seen.add((x, y))
+            checksum = zlib.crc32(data)
+            old = self.tiles.get((x, y))
+            if old is not None and old[0] == checksum:
+                continue
+            counts = hueCounts(data, w, h, depth, -x % stride, stride)
+            self.counts += counts if old is None else counts - old[1]
+            self.tiles[(x, y)] = (checksum, counts)
+            recomputed += 1
+        for key in [key for key in self.tiles if key not in seen]:
+            self.counts -= self.tiles.pop(key)[1]
+        return recomputed
+
+
+    def occupiedHues(self):
+        """Center hue (0..1) of every bin above the noise floor, ascending."""
+        threshold = max(1, int(self.counts.sum() * min_share))
+        return [(int(i) + 0.5) / hue_bins for i in numpy.flatnonzero(self.counts >= threshold)]
+
+
+def nextHue(hues, h, direction):
+    """The occupied hue `direction` bins after (or before) the bin holding `h`, or None."""
+    if not hues:
+        return None
+    current = int(h % 1.0 * hue_bins)
+    ring = [int(hue * hue_bins) for hue in hues]
+    for _ in range(abs(direction)):
+        if direction > 0:
+            later = [b for b in ring if b > current]
+            current = later[0] if later else ring[0]
+        else:
+            earlier = [b for b in ring if b < current]
+            current = earlier[-1] if earlier else ring[-1]
+    return (current + 0.5) / hue_bins
+
+
+class HueHistogramWorker(BackgroundWorker):
+    """Keeps per-node hue histograms up to date in a background thread."""
+
+    def __init__(self, done):
+        super().__init__(done, "BetterColorCyclerHues")
+        self.histograms = LRUCache(histogram_cache_size)    # only used from the worker thread
+
+
+    def submit(self, key, data, rect, depth, stride=1):
+        """`data` holds the rows of `rect` (x, y, w, h) that readRows() samples at `stride`."""
+        super().submit(key, self.compute, key, data, rect, depth, stride)
+
+
+    def compute(self, key, data, rect, depth, stride):
+        # a different stride samples other pixels: start a new histogram
+        histogram = self.histograms.lookup((key, depth, stride), NodeHueHistogram)
+        histogram.update(sampledTiles(data, *rect, stride), depth, stride)
+        return histogram.occupiedHues()
@@ -0,0 +1,122 @@
+from bisect import bisect_left
+from time import perf_counter_ns
+import json
+
+# Per-action timing for the BetterColorCycler hot path. Each action (a registered shortcut,
+# or "flush" for coalesced writes) keeps running counters and a fixed-bucket latency
+# histogram for every phase: the whole action plus the Krita color read, color write,
+# notifier echo and toast it triggered. When profiling is off nothing is wrapped at all,
+# so the disabled cost is one check per action.
+
+# Upper bucket bounds in microseconds; the last bucket catches everything slower.
+BUCKETS_US = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+BUCKET_BOUNDS_NS = tuple(b * 1000 for b in BUCKETS_US)
+
+
+class PhaseStats:
+
+    __slots__ = ("count", "total_ns", "max_ns", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_NS) + 1)
+
+
+    def add(self, elapsed):
+        self.count += 1
+        self.total_ns += elapsed
+        if elapsed > self.max_ns:
+            self.max_ns = elapsed
+        self.buckets[bisect_left(BUCKET_BOUNDS_NS, elapsed)] += 1
+
+
+    def percentile(self, p):
+        """Upper bound (us) of the bucket holding the p-th percentile; None if it's the overflow bucket."""
+        if not self.count:
+            return 0
+        target = self.count * p / 100.0
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return BUCKETS_US[i] if i < len(BUCKETS_US) else None
+        return None
+
+
+    def toDict(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total_ns / self.count / 1000.0 if self.count else 0.0,
+            "max_us": self.max_ns / 1000.0,
+            "p50_us": self.percentile(50),
+            "p99_us": self.percentile(99),
+            "buckets_us": list(BUCKETS_US) + ["inf"],
+            "histogram": list(self.buckets),
+        }
+
+
+class ActionProfiler:
+
+    def __init__(self):
+        self.stats = {}             # action name -> {phase -> PhaseStats}
+        self.current = "idle"       # action whose phases are being timed
+
+
+    def phaseStats(self, action, phase):
+        phases = self.stats.get(action)
+        if phases is None:
+            phases = self.stats[action] = {}
+        stats = phases.get(phase)
+        if stats is None:
+            stats = phases[phase] = PhaseStats()
+        return stats
+
+
+    def runAction(self, name, callback):
+        """Run `callback` timed as action `name`; phases it runs are attributed to that action."""
+        previous, self.current = self.current, name
+        t0 = perf_counter_ns()
+        try:
+            return callback()
+        finally:
+            self.phaseStats(name, "total").add(perf_counter_ns() - t0)
+            self.current = previous
+
+
+    def wrapPhase(self, phase, func):
+        """Time `func` as `phase` of whichever action is currently running."""
+        def timed(*args, **kwargs):
+            t0 = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.phaseStats(self.current, phase).add(perf_counter_ns() - t0)
+        return timed
+
+
+    def reset(self):
+        self.stats.clear()
+
+
+    def snapshot(self):
+        return {action: {phase: stats.toDict() for phase, stats in phases.items()}
+                for action, phases in self.stats.items()}
+
+
+    def report(self):
+        """Human-readable table, one line per action and phase."""
+        lines = [f"{'action':<20}{'phase':<8}{'count':>8}{'mean us':>10}{'p99 us':>9}{'max us':>10}"]
+        for action in sorted(self.stats):
+            for phase, stats in sorted(self.stats[action].items()):
+                d = stats.toDict()
+                p99 = d["p99_us"] if d["p99_us"] is not None else f">{BUCKETS_US[-1]}"
+                lines.append(f"{action:<20}{phase:<8}{d['count']:>8}{d['mean_us']:>10.1f}{p99:>9}{d['max_us']:>10.1f}")
+        return "\n".join(lines)
+
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        return path
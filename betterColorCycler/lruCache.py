@@ -0,0 +1,48 @@
+from collections import OrderedDict
+
+# Bounded least-recently-used cache, shared by everything the plugin memoizes: Krita color
+# conversions (ManagedColor <-> QColor), compiled step tables and profiles, palette snaps,
+# preview images and the workers' results. Callers choose keys that carry everything the value
+# depends on, e.g. a color together with the document's color model/depth/profile, so a hit
+# is never stale.
+
+
+class LRUCache:
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+    def lookup(self, key, compute):
+        """Return the cached value for `key`, calling compute() and storing the result on a miss."""
+        entries = self.entries
+        try:
+            value = entries[key]
+        except KeyError:
+            self.misses += 1
+            value = compute()
+            entries[key] = value
+            if len(entries) > self.capacity:
+                entries.popitem(last=False)
+            return value
+        self.hits += 1
+        entries.move_to_end(key)
+        return value
+
+
+    def clear(self):
+        """Drop all entries, e.g. when the active document or its color profile changes."""
+        self.entries.clear()
+
+
+    def hitRate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries),
+                "capacity": self.capacity, "hit_rate": self.hitRate()}
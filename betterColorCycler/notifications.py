@@ -0,0 +1,90 @@
+from time import monotonic
+import queue
+import sys
+import threading
+
+from PyQt5.QtCore import QTimer
+
+# Rate-limited user messages for BetterColorCycler. Messages posted in a burst (a fast dial
+# spin) collapse into the latest one, the canvas overlay is updated at most once per
+# interval, and log lines are written to stdout from a background thread instead of a
+# blocking print() on the UI thread.
+
+VERBOSITY_OFF = 0       # no overlay, no log
+VERBOSITY_INFO = 1      # resets, fine-mode toggles, configuration changes
+VERBOSITY_STEPS = 2     # additionally the step counter while stepping
+
+
+class LogSink:
+    """Buffered log writer; lines are queued and written in batches by a daemon thread."""
+
+    def __init__(self, stream=None, prefix="[BetterColorCycler] "):
+        self.stream = stream
+        self.prefix = prefix
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+
+
+    def write(self, line):
+        self.queue.put(line)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="BetterColorCyclerLog", daemon=True)
+            self.thread.start()
+
+
+    def run(self):
+        while True:
+            lines = [self.queue.get()]
+            while len(lines) < 256:
+                try:
+                    lines.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stream = self.stream or sys.stdout
+            try:
+                stream.write("".join(f"{self.prefix}{line}\n" for line in lines))
+                stream.flush()
+            except (OSError, ValueError, AttributeError):
+                pass        # stdout closed or missing (e.g. Krita started without a console)
+
+
+class MessageChannel:
+
+    def __init__(self, show, verbosity=VERBOSITY_INFO, min_interval_ms=250, sink=None):
+        self.show = show                    # callable(msg) that puts a message on the canvas
+        self.verbosity = verbosity
+        self.min_interval_ms = min_interval_ms
+        self.sink = sink if sink is not None else LogSink()
+
+        self.pending = None
+        self.last_shown = -1e9
+        self.merged = 0                     # messages replaced by a newer one before being shown
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+
+    def post(self, msg, level=VERBOSITY_INFO):
+        """Queue `msg`; it's shown now if the overlay is idle, else replaced/shown when the interval ends."""
+        if level > self.verbosity:
+            return
+        if self.pending is not None:
+            self.merged += 1
+        self.pending = msg
+        if self.timer.isActive():
+            return
+
+        wait = self.min_interval_ms - (monotonic() - self.last_shown) * 1000.0
+        if wait <= 0:
+            self.flush()
+        else:
+            self.timer.start(int(wait) + 1)
+
+
+    def flush(self):
+        msg, self.pending = self.pending, None
+        if msg is None:
+            return
+        self.last_shown = monotonic()
+        self.sink.write(msg)
+        self.show(msg)
@@ -0,0 +1,87 @@
+import math
+
+from .lruCache import LRUCache
+from .colorStepEngine import colorKey
+
+# Nearest-swatch lookup for snapping stepped colors onto a palette. Swatches are placed in
+# a uniform grid over OKLab (so "nearest" is close to what the eye sees), and a query only
+# visits the grid cells around it, in growing shells, until no unvisited cell can hold a
+# closer swatch. Results are memoized per 8-bit color, since a dial keeps revisiting the
+# same step colors. Pure Python; building is linear in the palette size.
+
+snap_cache_size = 4096
+
+
+def srgbToOklab(col):
+    """OKLab (L, a, b) of an sRGB (r, g, b) color in the 0..1 range."""
+    r, g, b = (c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4 for c in col)
+    l = (0.4122214708 * r + 0.5363325363 * g + 0.0514459929 * b) ** (1 / 3)
+    m = (0.2119034982 * r + 0.6806995451 * g + 0.1073969566 * b) ** (1 / 3)
+    s = (0.0883024619 * r + 0.2817188376 * g + 0.6299787005 * b) ** (1 / 3)
+    return (0.2104542553 * l + 0.7936177850 * m - 0.0040720468 * s,
+            1.9779984951 * l - 2.4285922050 * m + 0.4505937099 * s,
+            0.0259040371 * l + 0.7827717662 * m - 0.8086757660 * s)
+
+
+class PaletteIndex:
+
+    def __init__(self, colors):
+        self.colors = [tuple(col) for col in colors]
+        self.points = [srgbToOklab(col) for col in self.colors]
+
+        # about two swatches per cell if they spread evenly over their bounding box
+        volume = 1.0
+        for k in range(3):
+            values = [point[k] for point in self.points] or [0.0]
+            volume *= max(0.05, max(values) - min(values))
+        self.cell = min(0.2, max(0.005, (2 * volume / max(1, len(self.points))) ** (1 / 3)))
+        self.grid = {}
+        for i, point in enumerate(self.points):
+            self.grid.setdefault(self.cellOf(point), []).append(i)
+        cells = list(self.grid) or [(0, 0, 0)]
+        self.low = tuple(min(c[k] for c in cells) for k in range(3))
+        self.high = tuple(max(c[k] for c in cells) for k in range(3))
+        self.snaps = LRUCache(snap_cache_size)
+
+
+    def cellOf(self, point):
+        cell = self.cell
+        return (math.floor(point[0] / cell), math.floor(point[1] / cell), math.floor(point[2] / cell))
+
+
+    def __len__(self):
+        return len(self.colors)
+
+
+    def snap(self, col):
+        """The palette color nearest to `col` (col itself for an empty palette)."""
+        if not self.colors:
+            return col
+        return self.snaps.lookup(colorKey(col), lambda: self.colors[self.nearest(col)])
+
+
+    def nearest(self, col):
+        """Index of the swatch nearest to `col` in OKLab."""
+        p = srgbToOklab(col)
+        cx, cy, cz = self.cellOf(p)
+        # no occupied cell is further than this many shells away
+        reach = max(max(abs(c - lo), abs(c - hi)) for c, lo, hi in zip((cx, cy, cz), self.low, self.high))
+        grid, points = self.grid, self.points
+        best, best_d2 = -1, math.inf
+        for r in range(reach + 1):
+            for x in range(cx - r, cx + r + 1):
+                edge_x = x == cx - r or x == cx + r
+                for y in range(cy - r, cy + r + 1):
+                    edge_y = edge_x or y == cy - r or y == cy + r
+                    # inside the shell only the two z faces are new
+                    zs = range(cz - r, cz + r + 1) if edge_y else (cz - r, cz + r) if r else (cz,)
+                    for z in zs:
+                        for i in grid.get((x, y, z), ()):
+                            q = points[i]
+                            d2 = (q[0] - p[0]) ** 2 + (q[1] - p[1]) ** 2 + (q[2] - p[2]) ** 2
+                            if d2 < best_d2:
+                                best, best_d2 = i, d2
+            # anything outside the searched block is at least r cells away from p
+            if best >= 0 and best_d2 <= (r * self.cell) ** 2:
+                break
+        return best
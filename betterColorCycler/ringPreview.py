@@ -0,0 +1,277 @@
+import math
+
+from PyQt5.QtCore import QPointF, QRectF, Qt
+from PyQt5.QtGui import QColor, QConicalGradient, QImage, QLinearGradient, QPainter, QPen, QPixmap
+from PyQt5.QtWidgets import QSizePolicy, QWidget
+
+from .lruCache import LRUCache
+
+try:
+    import numpy
+except ImportError:         # Krita builds without NumPy fall back to Qt gradients (no step bands)
+    numpy = None
+
+# Live preview of the stepping state for the docker: a hue ring divided into the absolute
+# step positions, a tick for the anchor (the last picked color) and a dot for the current
+# hue, around a saturation/value square banded by the SV step counts with a dot for the
+# current SV step. With step curves the dividers follow the engine's hue warp and the SV
+# bands its level tables.
+#
+# Everything static is cached: the hue ring image (rebuilt on resize), the ring with its
+# step dividers per divider phase (the anchor's offset within one position, so relative
+# steps that re-anchor reuse a few pixmaps) and the SV square per whole hue degree. The
+# caches are cleared when the step counts change. The images are filled from NumPy
+# buffers in one pass. An absolute or SV tick only moves markers, so setState() invalidates
+# just the marker rectangles (plus the SV square when the hue degree changes).
+
+ring_width = 0.16           # ring thickness, as a fraction of the widget size
+marker_radius = 5
+sv_cache_size = 64
+ring_cache_size = 8
+divider_phases = 32         # divider positions are rounded to 1/32 of a step
+
+
+class RingPreview(QWidget):
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(120, 120)
+        sizePolicy = QSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+        sizePolicy.setHeightForWidth(True)
+        self.setSizePolicy(sizePolicy)
+
+        self.positions = 60
+        self.sat_num_steps = 30
+        self.val_num_steps = 30
+        self.h = 0.0
+        self.h_anchor = 0.0
+        self.sv_step = (0, 0)
+        self.sat_levels = None      # the engine's SV level tables; None = linear
+        self.val_levels = None
+        self.hue_warp = None
+
+        self.ring_image = None      # continuous hue ring for the current size
+        self.ring_pixmaps = LRUCache(ring_cache_size)   # ring + step dividers per phase
+        self.sv_images = LRUCache(sv_cache_size)
+
+
+    def heightForWidth(self, width):
+        return width
+
+
+    def setState(self, state):
+        """Take a stateSnapshot() from the extension and repaint what moved."""
+        dirty = self.markerRects()
+        full = False
+        if ((state["sat_num_steps"], state["val_num_steps"]) != (self.sat_num_steps, self.val_num_steps)
+                or state["sat_levels"] != self.sat_levels or state["val_levels"] != self.val_levels):
+            self.sat_num_steps, self.val_num_steps = state["sat_num_steps"], state["val_num_steps"]
+            self.sat_levels, self.val_levels = state["sat_levels"], state["val_levels"]
+            self.sv_images.clear()
+            full = True
+        if state["positions"] != self.positions or state["hue_warp"] is not self.hue_warp:
+            self.positions, self.hue_warp = state["positions"], state["hue_warp"]
+            self.ring_pixmaps.clear()
+            full = True
+        phase = self.dividerPhase()
+        if int(state["h"] * 360) != int(self.h * 360):
+            dirty.append(self.svRect().toAlignedRect())
+        self.h, self.h_anchor, self.sv_step = state["h"], state["h_anchor"], tuple(state["sv_step"])
+
+        if full or self.dividerPhase() != phase:
+            self.update()
+            return
+        for rect in dirty + self.markerRects():
+            self.update(rect)
+
+
+    def resizeEvent(self, event):
+        self.ring_image = None
+        self.ring_pixmaps.clear()
+        self.sv_images.clear()
+        super().resizeEvent(event)
+
+
+    # Geometry
+
+    def side(self):
+        return min(self.width(), self.height())
+
+
+    def center(self):
+        return QPointF(self.width() / 2, self.height() / 2)
+
+
+    def ringRadii(self):
+        outer = self.side() / 2 - marker_radius - 1
+        return outer - self.side() * ring_width, outer
+
+
+    def svRect(self):
+        inner = self.ringRadii()[0] * 0.68      # square inscribed in the ring's hole, with a margin
+        c = self.center()
+        return QRectF(c.x() - inner, c.y() - inner, 2 * inner, 2 * inner)
+
+
+    def anglePoint(self, hue, radius):
+        # hue 0 at the top, increasing clockwise
+        a = hue * 2 * math.pi
+        c = self.center()
+        return QPointF(c.x() + radius * math.sin(a), c.y() - radius * math.cos(a))
+
+
+    def svPoint(self):
+        r = self.svRect()
+        return QPointF(r.left() + r.width() * self.sv_step[0] / self.sat_num_steps,
+                       r.bottom() - r.height() * self.sv_step[1] / self.val_num_steps)
+
+
+    def markerRects(self):
+        """Widget rectangles covered by the current hue, anchor and SV markers."""
+        inner, outer = self.ringRadii()
+        pad = marker_radius + 2
+        rects = []
+        for a, b in ((self.anglePoint(self.h, (inner + outer) / 2), None),
+                     (self.anglePoint(self.h_anchor, outer - 2), self.anglePoint(self.h_anchor, outer + marker_radius)),
+                     (self.svPoint(), None)):
+            b = b or a
+            rects.append(QRectF(a, b).normalized().adjusted(-pad, -pad, pad, pad).toAlignedRect())
+        return rects
+
+
+    # Cached images
+
+    def dividerPhase(self):
+        """Offset of the anchor within one step position, in 1/divider_phases steps."""
+        anchor = self.hue_warp.position(self.h_anchor) if self.hue_warp else self.h_anchor
+        return int(round((anchor * self.positions) % 1.0 * divider_phases)) % divider_phases
+
+
+    def ringPixmap(self):
+        if self.ring_image is None:
+            self.ring_image = self.buildRingImage()
+        phase = self.dividerPhase()
+        return self.ring_pixmaps.lookup(phase, lambda: self.buildRingPixmap(phase))
+
+
+    def buildRingPixmap(self, phase):
+        pixmap = QPixmap.fromImage(self.ring_image)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(QColor(0, 0, 0, 110), 1))
+        inner, outer = self.ringRadii()
+        # dividers halfway between positions; position i sits at h_anchor + i / positions
+        if self.positions <= 360:
+            for i in range(int(self.positions)):
+                hue = (i + 0.5 + phase / divider_phases) / self.positions
+                if self.hue_warp:
+                    hue = self.hue_warp.hue(hue)
+                painter.drawLine(self.anglePoint(hue, inner), self.anglePoint(hue, outer))
+        painter.end()
+        return pixmap
+
+
+    def buildRingImage(self):
+        image = QImage(self.size(), QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        inner, outer = self.ringRadii()
+        if numpy is None:
+            gradient = QConicalGradient(self.center(), 90)
+            for i in range(7):
+                gradient.setColorAt(i / 6, QColor.fromHsvF((1.0 - i / 6) % 1.0, 1.0, 1.0))
+            painter = QPainter(image)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(QPen(gradient, outer - inner))
+            r = (inner + outer) / 2
+            c = self.center()
+            painter.drawEllipse(c, r, r)
+            painter.end()
+            return image
+
+        h, w = self.height(), self.width()
+        y, x = numpy.mgrid[0:h, 0:w].astype(numpy.float32)
+        dx = x + 0.5 - w / 2
+        dy = y + 0.5 - h / 2
+        radius = numpy.hypot(dx, dy)
+        hue = (numpy.arctan2(dx, -dy) / (2 * numpy.pi)) % 1.0
+        # 1px antialiased edges on both sides of the ring
+        alpha = numpy.clip(numpy.minimum(radius - inner, outer - radius) + 0.5, 0.0, 1.0)
+        return self.imageFromHsv(hue, 1.0, 1.0, alpha)
+
+
+    def svImage(self, hue_deg):
+        """SV square for a whole hue degree, banded into the SV step levels."""
+        return self.sv_images.lookup(hue_deg, lambda: self.buildSvImage(hue_deg))
+
+
+    def buildSvImage(self, hue_deg):
+        rect = self.svRect().toAlignedRect()
+        w, h = max(1, rect.width()), max(1, rect.height())
+        if numpy is None:
+            image = QImage(w, h, QImage.Format_ARGB32_Premultiplied)
+            painter = QPainter(image)
+            across = QLinearGradient(0, 0, w, 0)
+            across.setColorAt(0, Qt.white)
+            across.setColorAt(1, QColor.fromHsvF(hue_deg / 360, 1.0, 1.0))
+            painter.fillRect(0, 0, w, h, across)
+            down = QLinearGradient(0, 0, 0, h)
+            down.setColorAt(0, QColor(0, 0, 0, 0))
+            down.setColorAt(1, Qt.black)
+            painter.fillRect(0, 0, w, h, down)
+            painter.end()
+            return image
+
+        # step index under each pixel -> the level the engine would produce for it
+        sat = self.stepLevels(numpy.round((numpy.arange(w, dtype=numpy.float32) + 0.5) / w * self.sat_num_steps),
+                              self.sat_num_steps, self.sat_levels)
+        val = self.stepLevels(numpy.round((h - 0.5 - numpy.arange(h, dtype=numpy.float32)) / h * self.val_num_steps),
+                              self.val_num_steps, self.val_levels)
+        return self.imageFromHsv(numpy.float32(hue_deg / 360), sat[numpy.newaxis, :], val[:, numpy.newaxis],
+                                 numpy.ones((h, w), numpy.float32))
+
+
+    def stepLevels(self, steps, num_steps, levels):
+        if levels is None:
+            return steps / num_steps
+        return numpy.asarray(levels, numpy.float32)[steps.astype(numpy.int64)]
+
+
+    def imageFromHsv(self, hue, sat, val, alpha):
+        """Premultiplied ARGB32 QImage from broadcastable HSV and alpha arrays (0..1)."""
+        h6 = numpy.asarray(hue, numpy.float32) * 6.0
+        channels = []
+        for offset in (5.0, 3.0, 1.0):      # r, g, b of the standard hsv -> rgb mapping
+            k = (offset + h6) % 6.0
+            f = numpy.clip(numpy.minimum(k, 4.0 - k), 0.0, 1.0)
+            channels.append(val * (1.0 - sat * f))
+        r, g, b = numpy.broadcast_arrays(*channels, alpha)[:3]
+        a = numpy.broadcast_to(alpha, r.shape)
+        argb = ((numpy.round(a * 255).astype(numpy.uint32) << 24)
+                | (numpy.round(r * a * 255).astype(numpy.uint32) << 16)
+                | (numpy.round(g * a * 255).astype(numpy.uint32) << 8)
+                | numpy.round(b * a * 255).astype(numpy.uint32))
+        argb = numpy.ascontiguousarray(argb)
+        height, width = argb.shape
+        # QImage doesn't own the buffer: copy() detaches it before `argb` goes away
+        return QImage(argb.data, width, height, width * 4, QImage.Format_ARGB32_Premultiplied).copy()
+
+
+    # Painting
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.drawPixmap(0, 0, self.ringPixmap())
+        painter.drawImage(self.svRect().toAlignedRect().topLeft(), self.svImage(int(self.h * 360)))
+
+        inner, outer = self.ringRadii()
+        painter.setPen(QPen(Qt.white, 2))
+        painter.drawLine(self.anglePoint(self.h_anchor, outer - 2), self.anglePoint(self.h_anchor, outer + marker_radius))
+
+        painter.setBrush(Qt.NoBrush)
+        for point in (self.anglePoint(self.h, (inner + outer) / 2), self.svPoint()):
+            painter.setPen(QPen(Qt.black, 3))
+            painter.drawEllipse(point, marker_radius - 1, marker_radius - 1)
+            painter.setPen(QPen(Qt.white, 1.5))
+            painter.drawEllipse(point, marker_radius - 1, marker_radius - 1)
+        painter.end()
@@ -0,0 +1,66 @@
+from time import monotonic
+
+# Velocity-aware step sizes for the stepping shortcuts. Each action (hue relative/absolute,
+# saturation, value) keeps an estimate of its own tick rate; while the rate is above
+# `threshold_hz` a tick moves several steps instead of one:
+#
+#   multiplier = 1 + gain * (rate / threshold_hz - 1) ** curve      (capped at max_multiplier)
+#
+# The multiplier is a whole number, so a tick is always a whole number of engine steps and
+# the absolute step counter stays on the same grid as single ticks. Pausing, or reversing
+# direction, drops back to single steps for fine positioning.
+
+idle_reset_s = 0.3      # a gap this long between ticks starts the estimate over
+rate_smoothing = 0.5    # weight of the newest interval in the rate estimate
+
+
+class StepAccelerator:
+
+    def __init__(self, enabled=False, threshold_hz=8, gain=1.0, curve=2.0, max_multiplier=16):
+        self.configure(enabled, threshold_hz, gain, curve, max_multiplier)
+        self.tracks = {}            # action key -> [last tick time, rate estimate, last direction]
+        self.last_multiplier = 1
+
+
+    def configure(self, enabled, threshold_hz, gain, curve, max_multiplier):
+        self.enabled = enabled
+        self.threshold_hz = max(1, threshold_hz)
+        self.gain = max(0.0, gain)
+        self.curve = max(0.1, curve)
+        self.max_multiplier = max(1, int(max_multiplier))
+
+
+    def multiplier(self, rate):
+        """Whole step multiplier for a tick rate in ticks per second."""
+        excess = rate / self.threshold_hz - 1
+        if excess <= 0:
+            return 1
+        return min(self.max_multiplier, int(1 + self.gain * excess ** self.curve + 0.5))
+
+
+    def scale(self, key, direction, now=None):
+        """Steps for one tick of action `key` in `direction` (+1/-1), accelerated by its recent tick rate."""
+        if not self.enabled:
+            return direction
+        now = monotonic() if now is None else now
+        track = self.tracks.get(key)
+        if track is None:
+            track = self.tracks[key] = [now, 0.0, direction]
+            rate = 0.0
+        else:
+            dt = now - track[0]
+            if dt >= idle_reset_s or (track[2] > 0) != (direction > 0):
+                rate = 0.0
+            elif dt <= 0:
+                rate = track[1]
+            else:
+                rate = 1.0 / dt if track[1] == 0.0 else track[1] + rate_smoothing * (1.0 / dt - track[1])
+            track[0], track[1], track[2] = now, rate, direction
+
+        self.last_multiplier = self.multiplier(rate)
+        return direction * self.last_multiplier
+
+
+    def reset(self):
+        self.tracks.clear()
+        self.last_multiplier = 1
@@ -0,0 +1,34 @@
+# Text form of stepping commands, shared by the controller endpoint, the scripting API and
+# macros. Commands are separated by newlines or ';', each "<verb> [count]":
+#
+#   hue +7      relative hue steps          abs -2      absolute hue steps
+#   sat -3      saturation steps            val +1      value steps
+#   abs-set 42  jump to absolute step 42    fine        toggle fine mode
+#   reset       reset the step counter
+
+VERBS = {"hue", "abs", "sat", "val", "abs-set", "fine", "reset"}
+
+
+def parseCommands(data):
+    """Parse text (str or bytes) into a list of (verb, count) tuples; malformed commands are skipped."""
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode("ascii", "replace")
+    commands = []
+    for part in data.replace(";", "\n").splitlines():
+        fields = part.split()
+        if not fields or fields[0].lower() not in VERBS:
+            continue
+        verb = fields[0].lower()
+        try:
+            count = int(fields[1]) if len(fields) > 1 else 1
+        except ValueError:
+            continue
+        commands.append((verb, count))
+    return commands
+
+
+def formatCommands(commands):
+    """Inverse of parseCommands: "hue +3; val -2; fine"."""
+    return "; ".join(f"{verb} {count:+d}" if verb in ("hue", "abs", "sat", "val") else
+                     f"{verb} {count}" if verb == "abs-set" else verb
+                     for verb, count in commands)
@@ -0,0 +1,135 @@
+from bisect import bisect_left, bisect_right
+import colorsys
+import math
+
+# Step curves: how the evenly spaced step indices of a channel map onto channel values.
+# A curve is given as text (config.hue_curve / sat_curve / val_curve):
+#
+#   linear                      even steps in HSV, the default
+#   gamma 2.2                   value = step ** 2.2 (above 1: finer steps near 0)
+#   perceptual                  even steps in OKLab, measured along the channel
+#   points 0.3:0.1, 0.7:0.6     piecewise linear through these (step, value) points
+#
+# Curves are compiled into tables when the configuration changes: per-step 8-bit levels for
+# saturation and value, and a warp table for hue, so stepping only reads tables.
+
+CURVE_PRESETS = ("linear", "perceptual", "gamma 0.5", "gamma 2.2", "points 0.25:0.1, 0.75:0.9")
+CHANNELS = ("hue", "sat", "val")
+warp_resolution = 3600          # hue warp table entries per turn
+perceptual_samples = 360        # points measured along a channel for "perceptual"
+
+
+def parseCurve(spec, channel="val"):
+    """Monotone 0..1 -> 0..1 function for a curve spec; raises ValueError for a malformed one."""
+    words = spec.strip().lower().split(None, 1)
+    kind = words[0] if words else "linear"
+    arg = words[1] if len(words) > 1 else ""
+    if kind == "linear" and not arg:
+        return lambda x: x
+    if kind == "gamma":
+        try:
+            gamma = float(arg)
+        except ValueError:
+            raise ValueError(f"gamma needs a number: {spec!r}") from None
+        if not 0.05 <= gamma <= 20:
+            raise ValueError(f"gamma out of range (0.05..20): {spec!r}")
+        return lambda x: x ** gamma
+    if kind == "perceptual" and not arg:
+        return interpolator(perceptualPoints(channel))
+    if kind == "points":
+        points = [(0.0, 0.0)]
+        for pair in arg.replace(",", " ").split():
+            try:
+                x, y = (float(c) for c in pair.split(":"))
+            except ValueError:
+                raise ValueError(f"points are step:value pairs, e.g. 0.5:0.3: {spec!r}") from None
+            if not (points[-1][0] < x < 1.0 and points[-1][1] <= y <= 1.0):
+                raise ValueError(f"points must increase inside 0..1: {spec!r}")
+            points.append((x, y))
+        points.append((1.0, 1.0))
+        return interpolator(points)
+    raise ValueError(f"Unknown step curve: {spec!r}")
+
+
+def isLinear(spec):
+    return spec.strip().lower() in ("", "linear")
+
+
+def interpolator(points):
+    """Piecewise linear function through sorted (x, y) points spanning 0..1."""
+    xs = [x for x, y in points]
+    ys = [y for x, y in points]
+
+    def f(x):
+        i = min(max(bisect_right(xs, x), 1), len(xs) - 1)
+        x0, x1 = xs[i - 1], xs[i]
+        return ys[i - 1] + (ys[i] - ys[i - 1]) * (x - x0) / (x1 - x0)
+    return f
+
+
+def perceptualPoints(channel):
+    """(step, value) points that make equal steps cover equal OKLab distances along the channel:
+    around the hue circle at full saturation/value, from grey to full color (averaged over the
+    primaries and secondaries), or from black to white."""
+    from .paletteIndex import srgbToOklab
+    if channel == "hue":
+        paths = [lambda t: colorsys.hsv_to_rgb(t % 1.0, 1.0, 1.0)]
+    elif channel == "sat":
+        paths = [lambda t, h=h: colorsys.hsv_to_rgb(h / 6, t, 1.0) for h in range(6)]
+    else:
+        paths = [lambda t: (t, t, t)]
+
+    # cumulative distance, as a fraction of the path length, at evenly spaced channel values
+    values = [i / perceptual_samples for i in range(perceptual_samples + 1)]
+    total = [0.0] * len(values)
+    for path in paths:
+        labs = [srgbToOklab(path(t)) for t in values]
+        length = 0.0
+        lengths = [0.0]
+        for a, b in zip(labs, labs[1:]):
+            length += math.dist(a, b)
+            lengths.append(length)
+        for i, d in enumerate(lengths):
+            total[i] += d / length / len(paths)
+    total[-1] = 1.0
+    # the curve is the inverse: step (distance fraction) -> channel value
+    return list(zip(total, values))
+
+
+def channelLevels(spec, num_steps, channel="val"):
+    """8-bit codes (0..255) of the channel for each step index 0..num_steps."""
+    f = parseCurve(spec, channel)
+    codes = [int(round(min(max(f(i / num_steps), 0.0), 1.0) * 255)) for i in range(num_steps + 1)]
+    codes[0], codes[-1] = 0, 255
+    return codes
+
+
+def stepForCode(codes, code):
+    """First step index whose level reaches the 8-bit `code` (where a synced color's steps start)."""
+    return min(bisect_left(codes, code), len(codes) - 1)
+
+
+class HueWarp:
+    """Hue curve as a periodic table: hue(x) for a position x in turns, hue(x + 1) = hue(x) + 1."""
+
+    def __init__(self, spec, resolution=warp_resolution):
+        f = parseCurve(spec, "hue")
+        self.resolution = resolution
+        self.table = [f(i / resolution) for i in range(resolution + 1)]
+        self.table[0], self.table[-1] = 0.0, 1.0
+
+
+    def hue(self, x):
+        """Warped hue (0..1) at position `x` turns."""
+        p = x % 1.0 * self.resolution
+        i = min(int(p), self.resolution - 1)
+        lo = self.table[i]
+        return (lo + (self.table[i + 1] - lo) * (p - i)) % 1.0
+
+
+    def position(self, hue):
+        """Inverse of hue(): the position (0..1 turns) where the curve reaches `hue`."""
+        hue %= 1.0
+        i = min(max(bisect_right(self.table, hue), 1), self.resolution)
+        lo, hi = self.table[i - 1], self.table[i]
+        return (i - 1 + ((hue - lo) / (hi - lo) if hi > lo else 0.0)) / self.resolution
@@ -0,0 +1,40 @@
+from collections import OrderedDict
+
+# Stepping state per open canvas, so switching back to a document restores its absolute
+# calibration, fine mode and SV counters without a resync. Krita's Python wrappers for
+# views and documents are recreated on every call and can't be weakly referenced, so
+# entries are keyed by a stable document id and dropped when their document closes
+# (prune) or when the registry is over capacity (least recently used first).
+
+
+class ViewStateRegistry:
+
+    def __init__(self, capacity=16):
+        self.capacity = capacity
+        self.states = OrderedDict()
+
+
+    def save(self, key, state):
+        states = self.states
+        states[key] = state
+        states.move_to_end(key)
+        while len(states) > self.capacity:
+            states.popitem(last=False)
+
+
+    def restore(self, key):
+        """Saved state for `key`, or None; a hit marks the entry as most recently used."""
+        state = self.states.get(key)
+        if state is not None:
+            self.states.move_to_end(key)
+        return state
+
+
+    def prune(self, live_keys):
+        """Drop the state of every canvas whose key isn't in `live_keys`."""
+        for key in [key for key in self.states if key not in live_keys]:
+            del self.states[key]
+
+
+    def __len__(self):
+        return len(self.states)
@@ -0,0 +1,199 @@
+# Drives the extension's registered actions through QAction.trigger(), which emits
+# triggered(checked), against the stand-in krita module in benchmarks/.
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("PyQt5")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+import bench_stepping  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def ext():
+    ext = bench_stepping.loadExtension()
+    ext.config.update(coalesce_ms=0, history_merge_ms=0, cycle_source=0, bg_mode=0, snap_palette="")
+    ext.loadActions()
+    yield ext
+    ext.config.update(**{f"macro_{slot}": "" for slot in range(1, 6)})
+
+
+def trigger(ext, name):
+    for action in ext.window_menus[-1][1]:
+        if action.objectName() == name:
+            action.trigger()
+            return
+    raise KeyError(name)
+
+
+def test_step_action(ext):
+    ext.engine.forgetColor()
+    trigger(ext, "rotate_c_abs")
+    assert ext.engine.abs_step == 1
+
+
+def test_play_macro_action(ext):
+    ext.config.update(macro_2="Two: abs +3")
+    ext.engine.forgetColor()
+    trigger(ext, "bcc_macro_2")
+    assert ext.engine.abs_step == 3
+
+
+def test_record_macro_action(ext):
+    ext.config.update(**{f"macro_{slot}": "" for slot in range(1, 6)})
+    trigger(ext, "bcc_macro_record")
+    assert ext.recording is not None and ext.recording[0] == 1
+    trigger(ext, "rotate_c_rel")
+    trigger(ext, "bcc_macro_record")
+    assert ext.recording is None
+    assert ext.config.macro_1 == "Macro 1: hue +1"
+
+
+def test_profiled_actions(ext):
+    ext.config.update(profiling=True)           # installed at runtime, actions already connected
+    try:
+        ext.engine.forgetColor()
+        trigger(ext, "rotate_c_abs")
+        trigger(ext, "toggle_fine")
+        assert ext.engine.tog_fine
+        trigger(ext, "toggle_fine")
+        stats = ext.profiler.snapshot()
+        assert stats["rotate_c_abs"]["total"]["count"] == 1
+        assert stats["toggle_fine"]["read"]["count"] == 2
+    finally:
+        ext.config.update(profiling=False)
+    assert ext.profiler is None
+    assert "getCurFGColor" not in vars(ext)
+    trigger(ext, "rotate_c_abs")
+    assert ext.profileReport() == "Profiling is disabled."
+
+
+def test_set_abs_step_after_external_pick(ext):
+    from krita import Application, ManagedColor
+    from PyQt5.QtGui import QColor
+    ext.step_hue(10, absolute=True)
+    view = Application.activeWindow().activeView()
+    view.setForeGroundColor(ManagedColor(QColor(40, 120, 200).rgba()))      # picked outside the plugin
+    ext.set_abs_step(5)
+    assert ext.engine.abs_step == 5
+
+
+def test_undo_across_hue_steps_change(ext):
+    hue_steps = ext.config.hue_steps
+    ext.engine.forgetColor()
+    ext.step_hue(1, absolute=True)
+    hue = ext.engine.h
+    ext.step_hue(1, absolute=True)
+    ext.config.update(hue_steps=7)          # saved positions are in the old hue units
+    try:
+        ext.undoColor()
+        assert ext.engine.h == pytest.approx(hue)
+        ext.redoColor()
+        ext.step_hue(1, absolute=True)
+    finally:
+        ext.config.update(hue_steps=hue_steps)
+
+
+def test_docker_shows_last_run(ext):
+    from betterColorCycler.betterColorCyclerDocker import BetterColorCyclerDocker
+    docker = BetterColorCyclerDocker()
+    docker.show()
+    ext.engine.forgetColor()
+    trigger(ext, "rotate_c_abs")
+    assert docker.lastRunLabel.text() == "abs +1"
+    ext.apply([("val", -2)])
+    assert docker.lastRunLabel.text() == "val -2"
+    docker.timingsGroup.setChecked(True)
+    assert ext.profiler is not None
+    docker.timingsGroup.setChecked(False)
+    assert ext.profiler is None
+
+
+def test_menu_per_window(ext):
+    import krita
+    window = krita.Application._window
+    try:
+        krita.Application._window = krita.Window()          # a second main window
+        ext.loadActions()
+    finally:
+        krita.Application._window = window
+    (menu_1, actions_1), (menu_2, actions_2) = ext.window_menus[-2:]
+    for menu in (menu_2, menu_1):
+        menu.aboutToShow.emit()
+    assert menu_1.actions() == actions_1
+    assert menu_2.actions() == actions_2
+    assert not set(actions_1) & set(actions_2)
+
+
+def test_palette_checked_off_the_write_path(ext, monkeypatch):
+    import krita
+    from PyQt5.QtGui import QColor
+
+    class Resource:
+        def name(self):
+            return "Test"
+
+        def data(self):
+            return b"palette"
+
+    class Swatch:
+        def __init__(self, rgb):
+            self.rgb = rgb
+
+        def isValid(self):
+            return True
+
+        def color(self):
+            return krita.ManagedColor(QColor(*self.rgb).rgba())
+
+    class Palette:
+        swatches = [Swatch((255, 0, 0)), Swatch((0, 0, 255))]
+
+        def __init__(self, resource):
+            pass
+
+        def colorsCountTotal(self):
+            return len(self.swatches)
+
+        def colorSetEntryByIndex(self, i):
+            return self.swatches[i]
+
+    reads = []
+    monkeypatch.setattr(krita, "Palette", Palette, raising=False)
+    monkeypatch.setattr(krita.Application, "resources", lambda kind: reads.append(kind) or {"Test": Resource()},
+                        raising=False)
+    ext.config.update(snap_palette="Test")
+    try:
+        checks = len(reads)                         # once per extension listening to the config
+        for _ in range(5):
+            ext.makeStep(True, 1)
+        assert len(reads) == checks
+        assert ext.getCurFGColor() in ((1.0, 0.0, 0.0), (0.0, 0.0, 1.0))
+        ext.palette_timer.timeout.emit()            # idle: the palette is checked again
+        assert len(reads) == checks + 1
+    finally:
+        ext.config.update(snap_palette="")
+    assert ext.palette_index is None and not ext.palette_timer.isActive()
+
+
+def test_view_switch_flushes_queued_ticks(ext):
+    import krita
+    window = krita.Application.activeWindow()
+    old_view = window.activeView()
+    ext.config.update(coalesce_ms=1000)
+    try:
+        ext.engine.forgetColor()
+        start = ext.getCurFGColor()
+        trigger(ext, "rotate_c_abs")
+        trigger(ext, "rotate_c_abs")
+        assert ext.pending_ticks
+        new_view = window._view = krita.View()      # switch canvases before the flush timer fires
+        new_start = new_view.foregroundColor()
+        window.activeViewChanged.emit()
+    finally:
+        window._view = old_view
+        ext.config.update(coalesce_ms=0)
+    assert not ext.pending_ticks
+    assert ext.getCurFGColor(old_view) != start      # written to the canvas they were queued on
+    assert new_view.foregroundColor() is new_start  # and not to the new one
@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from bench_stepping import loadPluginModule  # noqa: E402
+
+ColorHistory = loadPluginModule("colorHistory").ColorHistory
+
+
+def history(capacity=4):
+    return ColorHistory(capacity, float_width=2, int_width=1, merge_ms=0)
+
+
+def push(h, n, merge=True):
+    h.push((n, n / 2), (n,), merge)
+
+
+def test_undo_redo():
+    h = history()
+    for n in range(3):
+        push(h, n)
+    assert h.current() == ((2.0, 1.0), (2,))
+    assert h.undo() == ((1.0, 0.5), (1,))
+    assert h.undo() == ((0.0, 0.0), (0,))
+    assert h.undo() is None
+    assert h.redo() == ((1.0, 0.5), (1,))
+    push(h, 7)                                  # drops the undone entry 2
+    assert len(h) == 3 and h.redo() is None
+    assert h.undo() == ((1.0, 0.5), (1,))
+
+
+def test_ring_wraps_dropping_the_oldest():
+    h = history(3)
+    for n in range(5):
+        push(h, n)
+    assert len(h) == 3
+    assert [h.entry(i)[1][0] for i in range(3)] == [2, 3, 4]
+    assert h.undo()[1] == (3,) and h.undo()[1] == (2,) and h.undo() is None
+
+
+def test_bursts_merge_into_one_entry():
+    h = ColorHistory(4, 2, 1, merge_ms=10000)
+    push(h, 0, merge=False)
+    push(h, 1)
+    push(h, 2)                                  # replaces 1
+    assert len(h) == 2 and h.current() == ((2.0, 1.0), (2,))
+    h.undo()
+    h.redo()
+    push(h, 3)                                  # not merged into an entry reached by redo
+    assert len(h) == 3
+
+
+def test_resize_empties():
+    h = history()
+    push(h, 1)
+    h.resize(8)
+    assert len(h) == 0 and h.current() is None and h.capacity == 8
@@ -0,0 +1,102 @@
+import colorsys
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from bench_stepping import loadPluginModule  # noqa: E402
+
+colorStepEngine = loadPluginModule("colorStepEngine")
+ColorStepEngine = colorStepEngine.ColorStepEngine
+
+START = (0.8, 0.3, 0.1)
+
+
+def test_hue_ring_table_matches_direct_colors():
+    engine = ColorStepEngine(max_steps=24)
+    col = START
+    colors = []
+    for _ in range(24):
+        col = engine.stepHue(col, True, 1)
+        colors.append(col)
+        assert col == pytest.approx(colorsys.hsv_to_rgb(engine.h, engine.cur_s, engine.cur_v))
+    misses = engine.hue_rings.misses
+    for expected in colors:                     # a second turn reads the same ring
+        col = engine.stepHue(col, True, 1)
+        assert col == expected
+    assert engine.hue_rings.misses == misses
+
+
+def test_sv_grid_matches_levels():
+    engine = ColorStepEngine(sat_num_steps=10, val_num_steps=10)
+    col = engine.shiftSV(START, 1, -3)
+    sat, val = engine.sv_step
+    assert col == pytest.approx(colorsys.hsv_to_rgb(engine.h, engine.sat_levels[sat], engine.val_levels[val]))
+    assert engine.shiftSV(engine.shiftSV(col, 1, 1), 1, -1) == col     # the same grid entry
+
+
+@pytest.mark.parametrize("mode_abs", [True, False])
+def test_full_rotations_return_exactly(mode_abs):
+    engine = ColorStepEngine(max_steps=24, angle_rel=15)
+    col = engine.stepHue(START, mode_abs, 0)
+    start, hue = col, engine.h
+    turn = engine.max_steps if mode_abs else engine.rel_max_steps
+    for _ in range(7 * turn):
+        col = engine.stepHue(col, mode_abs, 1)
+    assert col == start
+    assert engine.h == hue
+    assert type(engine.hue_pos) is int and engine.hue_pos == 0
+
+
+def test_fine_toggle_round_trip():
+    engine = ColorStepEngine(max_steps=24, sensitivity=1, sensitivity_fine=4)
+    assert engine.fine_ratio == 4
+    col = engine.stepHue(START, True, 5)
+    hue = engine.h
+    engine.toggleFine(col)
+    assert engine.abs_step == 20 and engine.h == hue
+    col = engine.stepHue(col, True, 4)          # one coarse step in fine steps
+    col = engine.stepHue(col, True, -4)
+    engine.toggleFine(col)
+    assert engine.abs_step == 5 and type(engine.abs_step) is int
+    assert engine.h == hue
+
+
+def test_uneven_sensitivities_stay_rational():
+    engine = ColorStepEngine(max_steps=24, sensitivity=3, sensitivity_fine=4)
+    assert engine.fine_ratio == colorStepEngine.Fraction(4, 3)
+    col = engine.stepHue(START, True, 2)
+    engine.toggleFine(col)
+    assert engine.abs_step == colorStepEngine.Fraction(8, 3)
+    engine.toggleFine(col)
+    assert engine.abs_step == 2 and type(engine.abs_step) is int
+
+
+def test_pack_unpack_round_trip():
+    engine = ColorStepEngine(max_steps=24, sensitivity=3, sensitivity_fine=4)
+    col = engine.stepHue(START, True, 2)
+    col = engine.shiftSV(col, 0, -2)
+    engine.toggleFine(col)
+    col = engine.stepHue(col, True, 1)
+    floats, ints = engine.packState()
+
+    other = ColorStepEngine(max_steps=24, sensitivity=3, sensitivity_fine=4)
+    assert other.unpackState(floats, ints) == col
+    for name in colorStepEngine.HISTORY_FLOAT_FIELDS + ("sv_step", "tog_fine", "sv_prev_mode"):
+        assert getattr(other, name) == getattr(engine, name), name
+    assert type(other.abs_step) is type(engine.abs_step)
+    assert not other.testColorChanged(col)
+
+
+def test_profile_switch_keeps_the_hue():
+    engine = ColorStepEngine(max_steps=60)
+    col = engine.stepHue(START, True, 7)
+    hue = engine.h
+    engine.useProfile(colorStepEngine.StepProfile(max_steps=7))
+    assert engine.h == pytest.approx(hue)
+    saved = engine.saveState()
+    engine.useProfile(colorStepEngine.StepProfile(max_steps=60))
+    engine.restoreState(saved)                  # taken in the 7-step profile's units
+    assert engine.h == pytest.approx(hue)
+    assert engine.stepHue(col, True, 0) == col
@@ -0,0 +1,35 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from bench_stepping import loadPluginModule  # noqa: E402
+
+deviceProfiles = loadPluginModule("deviceProfiles")
+
+
+def test_json_round_trip():
+    profiles = {"KD100": {"hue_steps": 24, "hue_curve": "perceptual", "accel_enabled": True},
+                "Keyboard": {"hue_steps": 12, "accel_gain": 0.5}}
+    text = deviceProfiles.formatProfiles(profiles)
+    assert deviceProfiles.parseProfiles(text) == profiles
+    assert deviceProfiles.formatProfiles(deviceProfiles.parseProfiles(text)) == text
+
+
+@pytest.mark.parametrize("text", ["", "  ", "{", "[1, 2]", '"name"'])
+def test_malformed_text_gives_no_profiles(text):
+    assert deviceProfiles.parseProfiles(text) == {}
+
+
+def test_unknown_fields_and_entries_dropped():
+    text = '{"Dial": {"hue_steps": 60, "colour": "red"}, "Broken": 3}'
+    assert deviceProfiles.parseProfiles(text) == {"Dial": {"hue_steps": 60}}
+
+
+def test_profile_values_of_config():
+    config = SimpleNamespace(**{field: i for i, field in enumerate(deviceProfiles.PROFILE_FIELDS)}, verbosity=2)
+    values = deviceProfiles.profileValues(config)
+    assert list(values) == list(deviceProfiles.PROFILE_FIELDS)
+    assert deviceProfiles.parseProfiles(deviceProfiles.formatProfiles({"Live": values})) == {"Live": values}
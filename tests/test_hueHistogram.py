@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+numpy = pytest.importorskip("numpy")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from bench_stepping import loadPluginModule  # noqa: E402
+
+hueHistogram = loadPluginModule("hueHistogram")
+readRows = loadPluginModule("dominantColors").readRows
+
+
+def layer(width, height, left, top):
+    """pixelData() of a random opaque BGRA layer at (left, top), with a call counter."""
+    pixels = numpy.random.default_rng(width).integers(0, 256, (height, width, 4), dtype=numpy.uint8)
+    pixels[..., 3] = 255
+    calls = []
+
+    def pixelData(x, y, w, h):
+        calls.append((x, y, w, h))
+        return pixels[y - top:y - top + h, x - left:x - left + w].tobytes()
+    return pixelData, calls
+
+
+@pytest.mark.parametrize("stride", [1, 3])
+def test_sampled_tiles_match_tile_reads(stride):
+    x, y, w, h = 37, 13, 700, 600
+    pixelData, calls = layer(w, h, x, y)
+    data, rows = readRows(pixelData, x, y, w, h, stride)
+    assert len(calls) == (rows if stride > 1 else 1)      # one call per sampled row, full width
+
+    histogram = hueHistogram.NodeHueHistogram()
+    histogram.update(hueHistogram.sampledTiles(data, x, y, w, h, stride), "U8", stride)
+    reference = hueHistogram.NodeHueHistogram()
+    tiles = []
+    for tx, ty, tw, th in hueHistogram.tileRects(x, y, w, h):
+        tile, tile_rows = readRows(pixelData, tx, ty, tw, th, stride)
+        if tile_rows:
+            tiles.append((tx, ty, tw, tile_rows, tile))
+    reference.update(tiles, "U8", stride)
+    assert (histogram.counts == reference.counts).all()
+    # an unchanged layer recomputes no tiles
+    assert histogram.update(hueHistogram.sampledTiles(data, x, y, w, h, stride), "U8", stride) == 0
@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from bench_stepping import loadPluginModule  # noqa: E402
+
+LRUCache = loadPluginModule("lruCache").LRUCache
+
+
+def test_miss_then_hit():
+    cache = LRUCache(4)
+    calls = []
+    assert cache.lookup("a", lambda: calls.append("a") or 1) == 1
+    assert cache.lookup("a", lambda: calls.append("a") or 2) == 1
+    assert calls == ["a"]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hitRate() == 0.5
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.lookup("a", lambda: 1)
+    cache.lookup("b", lambda: 2)
+    cache.lookup("a", lambda: None)             # a is now newer than b
+    cache.lookup("c", lambda: 3)                # evicts b
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.lookup("b", lambda: 4) == 4    # recomputed
+    assert list(cache.entries) == ["c", "b"]
+
+
+def test_clear_and_stats():
+    cache = LRUCache(3)
+    for key in range(5):
+        cache.lookup(key, lambda key=key: key * key)
+    assert cache.stats()["size"] == 3
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 5, "size": 0, "capacity": 3, "hit_rate": 0.0}
@@ -0,0 +1,44 @@
+import math
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from bench_stepping import loadPluginModule  # noqa: E402
+
+paletteIndex = loadPluginModule("paletteIndex")
+
+
+def linearNearest(index, col):
+    p = paletteIndex.srgbToOklab(col)
+    return min(range(len(index.points)), key=lambda i: math.dist(index.points[i], p))
+
+
+@pytest.mark.parametrize("size", [1, 7, 300])
+def test_nearest_matches_linear_scan(size):
+    rng = random.Random(size)
+    index = paletteIndex.PaletteIndex([(rng.random(), rng.random(), rng.random()) for _ in range(size)])
+    for _ in range(300):
+        col = (rng.random(), rng.random(), rng.random())
+        found, expected = index.nearest(col), linearNearest(index, col)
+        p = paletteIndex.srgbToOklab(col)
+        assert math.dist(index.points[found], p) == pytest.approx(math.dist(index.points[expected], p))
+
+
+def test_clustered_palette():
+    # swatches in one corner leave most grid cells empty; queries far away must still find them
+    rng = random.Random(1)
+    index = paletteIndex.PaletteIndex([(rng.random() * 0.1, rng.random() * 0.1, 0.0) for _ in range(50)])
+    for col in ((1.0, 1.0, 1.0), (0.0, 0.0, 1.0), (0.05, 0.05, 0.0)):
+        assert index.nearest(col) == linearNearest(index, col)
+
+
+def test_snap():
+    index = paletteIndex.PaletteIndex([(1.0, 0.0, 0.0), (0.0, 0.0, 1.0)])
+    assert index.snap((0.9, 0.1, 0.2)) == (1.0, 0.0, 0.0)
+    assert index.snap((0.9, 0.1, 0.2)) == (1.0, 0.0, 0.0)
+    assert index.snaps.hits == 1
+    assert paletteIndex.PaletteIndex([]).snap((0.5, 0.5, 0.5)) == (0.5, 0.5, 0.5)
+    assert paletteIndex.srgbToOklab((1.0, 1.0, 1.0)) == pytest.approx((1.0, 0.0, 0.0), abs=1e-4)
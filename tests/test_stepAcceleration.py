@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from bench_stepping import loadPluginModule  # noqa: E402
+
+stepAcceleration = loadPluginModule("stepAcceleration")
+StepAccelerator = stepAcceleration.StepAccelerator
+
+
+@pytest.mark.parametrize("rate, multiplier", [(0, 1), (8, 1), (12, 1), (16, 2), (24, 5), (40, 16), (400, 16)])
+def test_multiplier_curve(rate, multiplier):
+    accelerator = StepAccelerator(True, threshold_hz=8, gain=1.0, curve=2.0, max_multiplier=16)
+    assert accelerator.multiplier(rate) == multiplier
+
+
+def spin(accelerator, ticks, hz, direction=1, start=0.0):
+    return [accelerator.scale("hue", direction, start + i / hz) for i in range(ticks)]
+
+
+def test_fast_ticks_accelerate():
+    accelerator = StepAccelerator(True, threshold_hz=8, gain=1.0, curve=2.0, max_multiplier=16)
+    steps = spin(accelerator, 10, 32)
+    assert steps[0] == 1
+    assert steps[-1] == accelerator.multiplier(32) == 10
+    assert steps == sorted(steps)
+
+
+def test_slow_ticks_disabled_reversal_and_pause_step_once():
+    accelerator = StepAccelerator(True, threshold_hz=8)
+    assert spin(accelerator, 5, 4) == [1] * 5
+    spin(accelerator, 10, 32, start=10.0)
+    assert accelerator.scale("hue", -1, 10.0 + 10 / 32) == -1                       # reversed
+    spin(accelerator, 10, 32, start=20.0)
+    assert accelerator.scale("hue", 1, 20.0 + 9 / 32 + stepAcceleration.idle_reset_s) == 1   # paused
+    assert spin(StepAccelerator(False), 10, 32) == [1] * 10
+
+
+def test_actions_tracked_separately():
+    accelerator = StepAccelerator(True, threshold_hz=8)
+    spin(accelerator, 10, 32)
+    assert accelerator.scale("sat", 1, 10 / 32) == 1
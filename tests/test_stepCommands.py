@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from bench_stepping import loadPluginModule  # noqa: E402
+
+stepCommands = loadPluginModule("stepCommands")
+
+
+def test_text_round_trip():
+    text = "hue +3; abs -2; sat +1; val -4; abs-set 42; fine; reset"
+    commands = stepCommands.parseCommands(text)
+    assert commands == [("hue", 3), ("abs", -2), ("sat", 1), ("val", -4), ("abs-set", 42),
+                        ("fine", 1), ("reset", 1)]
+    assert stepCommands.formatCommands(commands) == text
+
+
+def test_bytes_newlines_and_case():
+    assert stepCommands.parseCommands(b"HUE 2\nVal -1;fine\n") == [("hue", 2), ("val", -1), ("fine", 1)]
+
+
+def test_default_count():
+    assert stepCommands.parseCommands("hue; abs") == [("hue", 1), ("abs", 1)]
+
+
+def test_malformed_commands_skipped():
+    assert stepCommands.parseCommands("spin 3; hue x; ; val +2;;") == [("val", 2)]
+    assert stepCommands.parseCommands("") == []
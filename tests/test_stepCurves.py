@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from bench_stepping import loadPluginModule  # noqa: E402
+
+stepCurves = loadPluginModule("stepCurves")
+
+
+@pytest.mark.parametrize("spec", stepCurves.CURVE_PRESETS + ("", "GAMMA 1", "points 0.5:0.5"))
+@pytest.mark.parametrize("channel", stepCurves.CHANNELS)
+def test_curves_are_monotone_from_0_to_1(spec, channel):
+    f = stepCurves.parseCurve(spec, channel)
+    values = [f(i / 100) for i in range(101)]
+    assert values[0] == pytest.approx(0.0, abs=1e-9) and values[-1] == pytest.approx(1.0)
+    assert all(a <= b + 1e-12 for a, b in zip(values, values[1:]))
+
+
+@pytest.mark.parametrize("spec", ["cubic", "gamma", "gamma x", "gamma 100", "points 0.5", "points 0.6:0.5, 0.4:0.7",
+                                  "points 1.5:0.5", "linear 2", "perceptual 2"])
+def test_malformed_specs_raise(spec):
+    with pytest.raises(ValueError):
+        stepCurves.parseCurve(spec)
+
+
+def test_levels():
+    assert stepCurves.channelLevels("linear", 4) == [0, 64, 128, 191, 255]
+    gamma = stepCurves.channelLevels("gamma 2", 4)
+    assert gamma == [0, 16, 64, 143, 255]
+    assert stepCurves.channelLevels("points 0.5:0.25", 2) == [0, 64, 255]
+    # a synced 8-bit value starts at the first step reaching it
+    assert stepCurves.stepForCode(gamma, 64) == 2
+    assert stepCurves.stepForCode(gamma, 65) == 3
+    assert stepCurves.stepForCode(gamma, 255) == 4
+
+
+def test_hue_warp_inverts():
+    warp = stepCurves.HueWarp("gamma 2")
+    for x in (0.0, 0.1, 0.25, 0.5, 0.9):
+        assert warp.position(warp.hue(x)) == pytest.approx(x, abs=1e-6)
+    assert warp.hue(1.25) == pytest.approx(warp.hue(0.25))       # periodic
+    assert warp.hue(0.5) == pytest.approx(0.25, abs=1e-6)
@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from bench_stepping import loadPluginModule  # noqa: E402
+
+ViewStateRegistry = loadPluginModule("viewStates").ViewStateRegistry
+
+
+def test_restore_saved_state():
+    states = ViewStateRegistry(4)
+    states.save("doc-a", (1, 2))
+    assert states.restore("doc-a") == (1, 2)
+    assert states.restore("doc-b") is None
+
+
+def test_evicts_least_recently_used():
+    states = ViewStateRegistry(2)
+    states.save("a", 1)
+    states.save("b", 2)
+    states.restore("a")                         # a is now newer than b
+    states.save("c", 3)
+    assert states.restore("b") is None
+    assert (states.restore("a"), states.restore("c")) == (1, 3)
+
+
+def test_prune_closed_documents():
+    states = ViewStateRegistry(4)
+    for key in "abc":
+        states.save(key, key)
+    states.prune({"b"})
+    assert len(states) == 1 and states.restore("b") == "b"